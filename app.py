@@ -1,30 +1,68 @@
 from flask import Flask, redirect, url_for, session
-from config import Config
+from config import Config, engine_options
 from models import db
+from replicas import replica_binds
 import routes.equipment as equipment_routes
 import routes.teams as teams_routes
 import routes.requests as requests_routes
 import routes.dashboard as dashboard_routes
 from routes.auth import auth
+from commands import register_commands
+import events
+import instrumentation
+import overdue
+import status_log
 
 
+def create_app(config=None):
+    """
+    Build the application.
 
-app = Flask(__name__)
-app.config.from_object(Config)
+    `config` is a config class or object (default Config), or a dict of
+    overrides applied on top of Config. Nothing here touches the
+    database: create or upgrade the schema with `flask db-upgrade`, and
+    connections open on first use.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    # Derived from the final settings, so overriding a URL gets the matching pool and binds
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config.setdefault('SQLALCHEMY_BINDS', replica_binds(app.config['SQLALCHEMY_REPLICA_URIS']))
 
-# Initialize database
-db.init_app(app)
+    # Initialize database
+    db.init_app(app)
 
-# Register blueprints
-app.register_blueprint(equipment_routes.bp)
-app.register_blueprint(teams_routes.bp)
-app.register_blueprint(requests_routes.bp)
-app.register_blueprint(dashboard_routes.bp)
+    # Register blueprints
+    app.register_blueprint(equipment_routes.bp)
+    app.register_blueprint(teams_routes.bp)
+    app.register_blueprint(requests_routes.bp)
+    app.register_blueprint(dashboard_routes.bp)
 
-app.register_blueprint(auth)
+    app.register_blueprint(auth)
+
+    # CLI commands (flask --app app <command>)
+    register_commands(app)
+
+    # Live Kanban feed: in-process, or shared through Redis
+    events.init_app(app)
+
+    # Server-Timing headers, /metrics and the optional N+1 detector
+    instrumentation.init_app(app)
+
+    # Background sweeper keeping MaintenanceRequest.overdue current
+    overdue.init_app(app)
+
+    # Write-behind status history (status_transition)
+    status_log.init_app(app)
+
+    app.add_url_rule('/', 'index', index)
+    return app
 
 
-@app.route('/')
 def index():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
@@ -38,9 +76,5 @@ def index():
     return redirect(url_for('auth.login'))
 
 
-# Create tables
-with app.app_context():
-    db.create_all()
-
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,96 @@
+"""
+GearGuard - Request archive
+
+Repaired and Scrap requests untouched for ARCHIVE_AFTER_DAYS are moved
+from maintenance_request to maintenance_request_archive in batches, one
+short transaction each, so the hot table (and every status-filtered
+query and Kanban column over it) grows with open work rather than with
+the plant's age. Archived rows keep their ids and column values.
+
+History reads that span both tables use `history_models` for the ORM
+side and `history_statements` for Core SELECTs such as exports.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, func, insert, literal, select
+from models import db, MaintenanceRequest, MaintenanceRequestArchive
+from changes import touch
+from events import RELOAD, get_broker
+
+# Finished work; these requests may be archived
+CLOSED_STATUSES = ['Repaired', 'Scrap']
+
+ARCHIVE_BATCH_SIZE = 1000
+
+_live = MaintenanceRequest.__table__
+_archive = MaintenanceRequestArchive.__table__
+# Closed requests are never overdue, so the flag isn't kept
+_copied = [column.name for column in _archive.columns if column.name != 'archived_at']
+
+# Both tables, archive first; MaintenanceRequest attribute names work on either
+history_models = (MaintenanceRequestArchive, MaintenanceRequest)
+
+
+def _archivable(cutoff):
+    # The newest row stays: a database whose counter can fall back to
+    # MAX(id) + 1 (MySQL before 8.0 after a restart) would hand its id out
+    # again, and the copy in the archive would then block that row forever
+    newest = select(func.max(_live.c.id)).scalar_subquery()
+    return and_(_live.c.status.in_(CLOSED_STATUSES), _live.c.updated_at < cutoff, _live.c.id != newest)
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move up to batch_size closed requests last updated before cutoff, in
+    the current transaction. Returns the number moved.
+    """
+    session = db.session
+    # Locked so a request reopened meanwhile is neither copied nor deleted
+    ids = session.scalars(
+        select(_live.c.id).where(_archivable(cutoff))
+        .order_by(_live.c.id).limit(batch_size).with_for_update()
+    ).all()
+    if not ids:
+        return 0
+
+    rows = select(
+        *[_live.c[name] for name in _copied],
+        literal(datetime.utcnow(), _archive.c.archived_at.type),
+    ).where(_live.c.id.in_(ids))
+    session.execute(insert(_archive).from_select(_copied + ['archived_at'], rows))
+    session.execute(delete(_live).where(_live.c.id.in_(ids)))
+    touch(session, _live.name, _archive.name)
+    return len(ids)
+
+
+def archive_closed_requests(older_than_days, batch_size=ARCHIVE_BATCH_SIZE, max_batches=None):
+    """Archive in committed batches until nothing qualifies; returns rows moved"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        db.session.commit()
+        total += moved
+        batches += 1
+
+    if total:
+        # Archived cards leave the Repaired/Scrap columns of open boards
+        get_broker().publish(RELOAD)
+    return total
+
+
+def may_be_archived(statuses):
+    """False when a status filter rules out every archived row"""
+    return not statuses or any(status in CLOSED_STATUSES for status in statuses)
+
+
+def history_statements(build, statuses=None):
+    """
+    build(model) -> SELECT for each table a history read should cover.
+
+    Returned in streaming order (archive, then live); the archive is
+    skipped when the status filter can only match open requests.
+    """
+    models = history_models if may_be_archived(statuses) else (MaintenanceRequest,)
+    return [build(model) for model in models]
@@ -0,0 +1,199 @@
+"""
+GearGuard - Workload-aware technician assignment
+
+Unassigned requests go to the least-loaded technician of the request's
+team. Each team's open workload (requests and estimated hours per
+technician) is kept in a min-heap, so picking a technician and charging
+them the new work are both O(log n) however large the team.
+
+The heaps are built per process from one aggregate over open requests
+and rebuilt every WORKLOAD_TTL seconds, which folds in closed requests
+and other processes' assignments. Assignments made here are charged as
+they are picked, so concurrent picks spread out, and refunded if their
+transaction rolls back; technician changes drop the board straight away.
+"""
+import heapq
+import threading
+from collections import defaultdict
+from sqlalchemy import bindparam, event, func, select, update
+from sqlalchemy.orm import Session
+from models import db, MaintenanceRequest, Technician, OPEN_STATUSES
+from cache import TTLCache
+from changes import on_commit, touch
+from events import RELOAD, publish_after_commit
+from kanban import PRIORITY_RANK
+from replicas import use_primary
+
+# Hours charged for open work with no duration recorded
+DEFAULT_ESTIMATE_HOURS = 2.0
+
+WORKLOAD_TTL = 60
+
+# Rows per executemany UPDATE when assigning in bulk
+ASSIGN_BATCH_SIZE = 1000
+
+
+def estimate(duration_hours):
+    return duration_hours if duration_hours else DEFAULT_ESTIMATE_HOURS
+
+
+class TeamWorkload:
+    """One team's technicians in a min-heap on (hours, count, technician id)"""
+
+    def __init__(self, loads):
+        # technician id -> (open count, open hours)
+        self.loads = dict(loads)
+        self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(hours, count, technician_id) for technician_id, (count, hours) in self.loads.items()]
+        heapq.heapify(self._heap)
+
+    def least_loaded(self):
+        """Technician id with the least open work, or None for an empty team"""
+        while self._heap:
+            hours, count, technician_id = self._heap[0]
+            if self.loads.get(technician_id) == (count, hours):
+                return technician_id
+            # Superseded by a later charge; drop it lazily
+            heapq.heappop(self._heap)
+        return None
+
+    def charge(self, technician_id, hours, count=1):
+        """Add (or with negative values, remove) open work for a technician"""
+        current = self.loads.get(technician_id)
+        if current is None:
+            return
+        load = (current[0] + count, current[1] + hours)
+        self.loads[technician_id] = load
+        heapq.heappush(self._heap, (load[1], load[0], technician_id))
+        # Bound the superseded entries left behind by lazy deletion
+        if len(self._heap) > 2 * len(self.loads) + 32:
+            self._rebuild()
+
+
+class WorkloadBoard:
+    """Every team's TeamWorkload; safe to use from any thread"""
+
+    def __init__(self, teams):
+        self.teams = teams
+        self._lock = threading.Lock()
+
+    def pick(self, team_id, hours):
+        """Least-loaded technician of a team, charged with the work; None if the team has none"""
+        with self._lock:
+            team = self.teams.get(team_id)
+            technician_id = team.least_loaded() if team else None
+            if technician_id is not None:
+                team.charge(technician_id, hours)
+            return technician_id
+
+    def refund(self, team_id, technician_id, hours):
+        """Take back a pick whose assignment was never committed"""
+        with self._lock:
+            team = self.teams.get(team_id)
+            if team:
+                team.charge(technician_id, -hours, count=-1)
+
+
+@use_primary
+def load_board():
+    """Build a board from the technicians table and one aggregate over open requests"""
+    technician_teams = dict(db.session.query(Technician.id, Technician.team_id))
+    loads = defaultdict(dict)
+    for technician_id, team_id in technician_teams.items():
+        loads[team_id][technician_id] = (0, 0.0)
+
+    rows = db.session.execute(
+        select(
+            MaintenanceRequest.assigned_technician_id,
+            func.count(MaintenanceRequest.id),
+            func.sum(func.coalesce(MaintenanceRequest.duration_hours, DEFAULT_ESTIMATE_HOURS)),
+        ).where(
+            MaintenanceRequest.status.in_(OPEN_STATUSES),
+            MaintenanceRequest.assigned_technician_id.isnot(None),
+        ).group_by(MaintenanceRequest.assigned_technician_id)
+    )
+    for technician_id, count, hours in rows:
+        team_id = technician_teams.get(technician_id)
+        if team_id is not None:
+            loads[team_id][technician_id] = (count, float(hours or 0))
+
+    return WorkloadBoard({team_id: TeamWorkload(team_loads) for team_id, team_loads in loads.items()})
+
+
+_board_cache = TTLCache(maxsize=1, ttl=WORKLOAD_TTL)
+
+
+def board():
+    return _board_cache.get_or_set('board', load_board)
+
+
+@on_commit('technician')
+def invalidate_board(changed_tables=None):
+    _board_cache.invalidate()
+
+
+# ---------------- ASSIGNING ----------------
+def _pick(workload, team_id, hours):
+    """workload.pick, refunded if the session's transaction rolls back"""
+    technician_id = workload.pick(team_id, hours)
+    if technician_id is not None:
+        db.session.info.setdefault('workload_charges', []).append((workload, team_id, technician_id, hours))
+    return technician_id
+
+
+@event.listens_for(Session, 'after_commit')
+def _keep_charges(session):
+    session.info.pop('workload_charges', None)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _refund_charges(session, previous_transaction):
+    for workload, team_id, technician_id, hours in session.info.pop('workload_charges', ()):
+        workload.refund(team_id, technician_id, hours)
+
+
+def assign(req):
+    """Give an unassigned request its team's least-loaded technician; returns the id or None"""
+    technician_id = _pick(board(), req.maintenance_team_id, estimate(req.duration_hours))
+    if technician_id is not None:
+        req.assigned_technician_id = technician_id
+    return technician_id
+
+
+def assign_unassigned(limit=None):
+    """
+    Assign every open, unassigned request, most urgent first, in one
+    transaction. Returns the number assigned.
+    """
+    table = MaintenanceRequest.__table__
+    pending = select(
+        MaintenanceRequest.id, MaintenanceRequest.maintenance_team_id, MaintenanceRequest.duration_hours
+    ).where(
+        MaintenanceRequest.status.in_(OPEN_STATUSES),
+        MaintenanceRequest.assigned_technician_id.is_(None),
+    ).order_by(PRIORITY_RANK, MaintenanceRequest.id).with_for_update()
+    if limit:
+        pending = pending.limit(limit)
+
+    workload = board()
+    assignments = []
+    for request_id, team_id, duration_hours in db.session.execute(pending).all():
+        technician_id = _pick(workload, team_id, estimate(duration_hours))
+        if technician_id is not None:
+            assignments.append({'request_id': request_id, 'technician_id': technician_id})
+
+    # The version bump lets open boards and cached cards see the new technician
+    stmt = update(table).where(
+        table.c.id == bindparam('request_id'), table.c.assigned_technician_id.is_(None)
+    ).values(assigned_technician_id=bindparam('technician_id'), version_id=table.c.version_id + 1)
+    for start in range(0, len(assignments), ASSIGN_BATCH_SIZE):
+        db.session.execute(stmt, assignments[start:start + ASSIGN_BATCH_SIZE])
+
+    if assignments:
+        touch(db.session, table.name)
+        # Bulk updates bypass the per-card feed; open boards reload instead
+        publish_after_commit(db.session, RELOAD)
+    db.session.commit()
+    return len(assignments)
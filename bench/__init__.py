@@ -0,0 +1,26 @@
+"""
+GearGuard - Benchmarks
+
+Run from the project root:
+
+    python -m bench.fleet --database-url sqlite:///bench.db      # seed a synthetic fleet
+    python -m bench.harness --database-url sqlite:///bench.db    # time the routes
+    python -m bench.login                                         # login throughput
+    python -m bench.assignment                                    # technician assignment
+    python -m bench.startup                                       # worker boot and fork time
+    python -m bench.serve --database-url sqlite:///bench.db       # debug server vs flask serve
+"""
+import os
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def use_database(url):
+    """Point the app at url; must run before the app is first imported"""
+    os.environ['DATABASE_URL'] = url
@@ -0,0 +1,114 @@
+"""
+Technician assignment throughput.
+
+Times picks on the heap-backed workload board against a linear scan for
+the least-loaded technician, with --technicians spread over --teams (and
+once more with them all in a single team, the worst case for a scan).
+With --database-url it also unassigns --unassign open requests in that
+database (one seeded by bench.fleet; it is modified) and times the bulk
+assign_unassigned() run that assigns them again.
+
+    python -m bench.assignment --technicians 2000 --teams 50 --picks 200000
+    python -m bench.assignment --database-url sqlite:///bench.db --unassign 5000
+"""
+import argparse
+import random
+import time
+from bench import use_database
+
+
+def _loads(rng, technicians, teams):
+    loads = {team_id: {} for team_id in range(1, teams + 1)}
+    for technician_id in range(1, technicians + 1):
+        count = rng.randint(0, 30)
+        loads[(technician_id - 1) % teams + 1][technician_id] = (count, float(count * rng.choice([1, 2, 4])))
+    return loads
+
+
+def _time_heap(loads, picks, rng):
+    from assignment import TeamWorkload, WorkloadBoard
+
+    board = WorkloadBoard({team_id: TeamWorkload(team) for team_id, team in loads.items()})
+    team_ids = list(loads)
+    started = time.perf_counter()
+    for _ in range(picks):
+        board.pick(rng.choice(team_ids), rng.choice([1.0, 2.0, 4.0]))
+    return time.perf_counter() - started
+
+
+def _time_scan(loads, picks, rng):
+    loads = {team_id: dict(team) for team_id, team in loads.items()}
+    team_ids = list(loads)
+    started = time.perf_counter()
+    for _ in range(picks):
+        team = loads[rng.choice(team_ids)]
+        technician_id = min(team, key=lambda t: (team[t][1], team[t][0], t))
+        count, hours = team[technician_id]
+        team[technician_id] = (count + 1, hours + rng.choice([1.0, 2.0, 4.0]))
+    return time.perf_counter() - started
+
+
+def _report(label, picks, elapsed):
+    print(f'{label:32} {picks / elapsed:12,.0f} picks/s  {elapsed / picks * 1e6:8.2f}us/pick')
+
+
+def in_memory(technicians, teams, picks, seed):
+    for team_count in (teams, 1):
+        loads = _loads(random.Random(seed), technicians, team_count)
+        size = technicians // team_count
+        _report(f'heap   {team_count:3} teams x {size:4}', picks, _time_heap(loads, picks, random.Random(seed)))
+        # The scan is slow enough on big teams that a sample suffices
+        sample = max(1, picks // max(1, size // 10))
+        _report(f'scan   {team_count:3} teams x {size:4}', sample, _time_scan(loads, sample, random.Random(seed)))
+
+
+def bulk(database_url, unassign):
+    use_database(database_url)
+    from app import create_app
+    from models import db, MaintenanceRequest, OPEN_STATUSES
+    from assignment import assign_unassigned, load_board
+
+    app = create_app()
+    with app.app_context():
+        ids = db.session.scalars(
+            db.select(MaintenanceRequest.id)
+            .where(MaintenanceRequest.status.in_(OPEN_STATUSES))
+            .order_by(MaintenanceRequest.id).limit(unassign)
+        ).all()
+        db.session.execute(
+            db.update(MaintenanceRequest.__table__)
+            .where(MaintenanceRequest.__table__.c.id.in_(ids))
+            .values(assigned_technician_id=None)
+        )
+        db.session.commit()
+
+        started = time.perf_counter()
+        load_board()
+        built = time.perf_counter() - started
+
+        started = time.perf_counter()
+        assigned = assign_unassigned()
+        elapsed = time.perf_counter() - started
+    print(f'board build (aggregate over open requests)  {built * 1000:8.1f}ms')
+    print(f'assign_unassigned: {assigned:,} requests in {elapsed * 1000:.1f}ms, one transaction')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--technicians', type=int, default=2000)
+    parser.add_argument('--teams', type=int, default=50)
+    parser.add_argument('--picks', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='a database seeded by bench.fleet (modified)')
+    parser.add_argument('--unassign', type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.technicians < 1 or args.teams < 1:
+        parser.error('--technicians and --teams must be positive')
+    in_memory(args.technicians, args.teams, args.picks, args.seed)
+    if args.database_url:
+        bulk(args.database_url, args.unassign)
+
+
+if __name__ == '__main__':
+    main()
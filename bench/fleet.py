@@ -0,0 +1,194 @@
+"""
+Synthetic fleet generator.
+
+Seeds an empty SQLite or MySQL database with a plant-sized fleet: by
+default 50 teams, 2,000 technicians, 200,000 equipment and 2,000,000
+maintenance requests. Request volume is skewed towards a minority of
+busy equipment and towards recent dates, and most requests are closed,
+as in a real history. The same --seed always produces the same data.
+
+    python -m bench.fleet --database-url sqlite:///bench.db
+    python -m bench.fleet --database-url sqlite:///small.db --scale 0.01
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from bench import use_database
+
+TEAMS = 50
+TECHNICIANS = 2000
+EQUIPMENT = 200_000
+REQUESTS = 2_000_000
+BATCH_SIZE = 10_000
+
+KINDS = ['Pump', 'Compressor', 'Conveyor', 'Forklift', 'Lathe', 'Press', 'Boiler',
+         'Generator', 'Chiller', 'Robot Arm', 'CNC Mill', 'Welder', 'Mixer', 'Crane']
+DEPARTMENTS = ['Assembly', 'Fabrication', 'Logistics', 'Packaging', 'Paint', 'Quality',
+               'Utilities', 'Warehouse', 'Machining', 'Foundry', 'Tooling', 'Facilities']
+SUBJECTS = ['Leaking seal', 'Unusual noise', 'Overheating', 'Scheduled inspection',
+            'Belt replacement', 'Calibration', 'Lubrication', 'Sensor fault', 'Power loss',
+            'Filter change', 'Vibration', 'Software update']
+
+# Most history is closed work
+STATUS_WEIGHTS = {'Repaired': 70, 'In Progress': 14, 'New': 13, 'Scrap': 3}
+PRIORITY_WEIGHTS = {'High': 20, 'Medium': 55, 'Low': 25}
+
+HISTORY_DAYS = 3 * 365
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(connection, table, rows, label, total):
+    done = 0
+    for batch in _batches(rows):
+        connection.execute(table.insert(), batch)
+        done += len(batch)
+        print(f'\r{label}: {done:,}/{total:,}', end='', file=sys.stderr)
+    print(file=sys.stderr)
+
+
+def generate(connection, scale=1.0, seed=42):
+    from models import Equipment, MaintenanceRequest, MaintenanceTeam, Technician
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    today = now.date()
+
+    teams = max(1, int(TEAMS * scale))
+    technicians = max(teams, int(TECHNICIANS * scale))
+    equipment = max(1, int(EQUIPMENT * scale))
+    requests = max(1, int(REQUESTS * scale))
+
+    _insert(connection, MaintenanceTeam.__table__, (
+        {'id': i, 'team_name': f'Team {i:02d}'} for i in range(1, teams + 1)
+    ), 'teams', teams)
+
+    team_technicians = {team_id: [] for team_id in range(1, teams + 1)}
+    technician_rows = []
+    for i in range(1, technicians + 1):
+        team_id = (i - 1) % teams + 1
+        team_technicians[team_id].append(i)
+        technician_rows.append({'id': i, 'name': f'Technician {i:04d}', 'team_id': team_id})
+    _insert(connection, Technician.__table__, technician_rows, 'technicians', technicians)
+
+    # (team_id, technician ids) per equipment, for the requests below
+    equipment_teams = []
+
+    def equipment_rows():
+        for i in range(1, equipment + 1):
+            team_id = rng.randint(1, teams)
+            equipment_teams.append(team_id)
+            purchased = today - timedelta(days=rng.randint(30, 3650))
+            yield {
+                'id': i,
+                'equipment_name': f'{rng.choice(KINDS)} {i}',
+                'serial_number': f'SN-{i:07d}',
+                'department': rng.choice(DEPARTMENTS),
+                'assigned_employee': f'Employee {rng.randint(1, 500):03d}' if rng.random() < 0.6 else None,
+                'purchase_date': purchased,
+                'warranty_expiry': purchased + timedelta(days=3 * 365),
+                'location': f'Plant {rng.randint(1, 4)} / Bay {rng.randint(1, 40)}',
+                'maintenance_team_id': team_id,
+                'default_technician_id': rng.choice(team_technicians[team_id]) if rng.random() < 0.7 else None,
+                'is_scrapped': False,
+                'open_request_count': 0,
+                'version_id': 1,
+            }
+
+    _insert(connection, Equipment.__table__, equipment_rows(), 'equipment', equipment)
+
+    def request_rows():
+        for i in range(1, requests + 1):
+            # Squaring skews work towards low ids: a minority of equipment is busy
+            equipment_id = int(equipment * rng.random() ** 2) + 1
+            team_id = equipment_teams[equipment_id - 1]
+            created = now - timedelta(
+                days=int(HISTORY_DAYS * rng.random() ** 1.5),
+                seconds=rng.randint(0, 86399)
+            )
+            status = _weighted(rng, STATUS_WEIGHTS)
+            preventive = rng.random() < 0.3
+            scheduled = None
+            if preventive or rng.random() < 0.2:
+                scheduled = created.date() + timedelta(days=rng.randint(0, 60))
+            yield {
+                'subject': rng.choice(SUBJECTS),
+                'request_type': 'Preventive' if preventive else 'Corrective',
+                'equipment_id': equipment_id,
+                'maintenance_team_id': team_id,
+                'assigned_technician_id': rng.choice(team_technicians[team_id]) if rng.random() < 0.8 else None,
+                'scheduled_date': scheduled,
+                'duration_hours': round(rng.uniform(0.5, 8), 1) if status == 'Repaired' else None,
+                'status': status,
+                'priority': _weighted(rng, PRIORITY_WEIGHTS),
+                'created_at': created,
+                'updated_at': created + timedelta(hours=rng.randint(0, 72)),
+                'version_id': 1,
+            }
+
+    _insert(connection, MaintenanceRequest.__table__, request_rows(), 'requests', requests)
+
+    # Denormalized state the routes keep up as they go
+    scrapped = Equipment.__table__.update().where(
+        Equipment.__table__.c.id.in_(
+            MaintenanceRequest.__table__.select()
+            .with_only_columns(MaintenanceRequest.__table__.c.equipment_id)
+            .where(MaintenanceRequest.__table__.c.status == 'Scrap')
+        )
+    ).values(is_scrapped=True)
+    connection.execute(scrapped)
+
+    return {'teams': teams, 'technicians': technicians, 'equipment': equipment, 'requests': requests}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', required=True, help='an empty SQLite or MySQL database')
+    parser.add_argument('--scale', type=float, default=1.0, help='fraction of the default volumes')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app import create_app
+    from models import db, Equipment
+    import migrations
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Equipment.id).first():
+            parser.error('the database already has equipment; seed an empty one')
+        db.session.remove()
+
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'sqlite':
+                connection.exec_driver_sql('PRAGMA synchronous=OFF')
+            counts = generate(connection, scale=args.scale, seed=args.seed)
+
+        # Counters, plus migrations' indexes and backfills run once over the loaded rows
+        Equipment.recount_open_requests()
+        db.session.commit()
+        migrations.upgrade(db.engine)
+
+    summary = ', '.join(f'{count:,} {name}' for name, count in counts.items())
+    print(f'Seeded {summary} in {time.perf_counter() - started:.0f}s')
+
+
+if __name__ == '__main__':
+    main()
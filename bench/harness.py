@@ -0,0 +1,226 @@
+"""
+Route benchmark harness.
+
+Drives the main routes of every blueprint through the Flask test client
+against an already seeded database (see bench.fleet), and reports p50 and
+p95 latency, SQL statements per request and peak Python memory per
+scenario. Results are written as a JSON baseline; pass --compare to fail
+when a later run regresses against one.
+
+    python -m bench.harness --database-url sqlite:///bench.db --output baseline.json
+    python -m bench.harness --database-url sqlite:///bench.db --compare baseline.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from calendar import monthrange
+from bench import percentile, use_database
+
+
+class Scenario:
+    def __init__(self, name, method, url, role='Admin', body=None, setup=None):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.role = role
+        # body and setup are called per iteration
+        self.body = body
+        self.setup = setup
+
+
+def scenarios(state):
+    """Everything timed, given ids picked from the seeded data"""
+    from overdue import today as current_day
+    from stats import invalidate_stats
+
+    today = current_day()
+    first, last = today.replace(day=1), today.replace(day=monthrange(today.year, today.month)[1])
+    toggle = {'status': 'New'}
+
+    def status_body():
+        toggle['status'] = 'In Progress' if toggle['status'] == 'New' else 'New'
+        return {'request_id': state['request_id'], 'status': toggle['status']}
+
+    return [
+        Scenario('kanban', 'GET', '/dashboard/kanban'),
+        Scenario('kanban_column', 'GET', '/dashboard/kanban/column?status=Repaired'),
+        # The stats cache is cleared each time to time the aggregate itself
+        Scenario('dashboard', 'GET', '/dashboard/', setup=invalidate_stats),
+        Scenario('calendar', 'GET', f'/dashboard/calendar?year={today.year}&month={today.month}'),
+        Scenario('calendar_range', 'GET', f'/dashboard/calendar/range?start={first}&end={last}'),
+        Scenario('technician_dashboard', 'GET', '/dashboard/technician', role='Technician'),
+        Scenario('equipment_list', 'GET', '/equipment/'),
+        Scenario('equipment_list_department', 'GET', f'/equipment/?department={state["department"]}'),
+        Scenario('equipment_list_search', 'GET', '/equipment/?search=pump'),
+        Scenario('equipment_typeahead', 'GET', '/equipment/api/search?q=pum'),
+        Scenario('equipment_technicians_api', 'GET', f'/equipment/api/technicians/{state["team_id"]}'),
+        Scenario('teams', 'GET', '/teams/'),
+        Scenario('request_form', 'GET', '/requests/create'),
+        Scenario('update_status', 'POST', '/requests/update_status', body=status_body),
+    ]
+
+
+def pick_state():
+    """Stable ids to aim the scenarios at: the busiest technician and so on"""
+    from sqlalchemy import func
+    from models import db, Equipment, MaintenanceRequest, MaintenanceTeam
+
+    technician_id = db.session.query(MaintenanceRequest.assigned_technician_id).filter(
+        MaintenanceRequest.assigned_technician_id.isnot(None)
+    ).group_by(MaintenanceRequest.assigned_technician_id).order_by(
+        func.count().desc()
+    ).limit(1).scalar()
+    return {
+        'technician_id': technician_id,
+        'team_id': db.session.query(MaintenanceTeam.id).order_by(MaintenanceTeam.id).limit(1).scalar(),
+        'department': db.session.query(Equipment.department).filter(
+            Equipment.department.isnot(None)
+        ).limit(1).scalar() or '',
+        'request_id': db.session.query(MaintenanceRequest.id).filter(
+            MaintenanceRequest.status.in_(['New', 'In Progress'])
+        ).order_by(MaintenanceRequest.id).limit(1).scalar(),
+    }
+
+
+def run(app, iterations, warmup):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    statements = [0]
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def count(*args):
+        statements[0] += 1
+
+    with app.app_context():
+        state = pick_state()
+
+    clients = {}
+    for role in ('Admin', 'Technician'):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+            session['role'] = role
+            session['technician_id'] = state['technician_id']
+        clients[role] = client
+
+    def request(scenario):
+        if scenario.setup:
+            with app.app_context():
+                scenario.setup()
+        client = clients[scenario.role]
+        if scenario.method == 'GET':
+            return client.get(scenario.url)
+        return client.post(scenario.url, json=scenario.body() if scenario.body else None)
+
+    results = {}
+    for scenario in scenarios(state):
+        for _ in range(warmup):
+            request(scenario)
+
+        latencies, queries = [], []
+        status = None
+        for _ in range(iterations):
+            statements[0] = 0
+            started = time.perf_counter()
+            response = request(scenario)
+            latencies.append(time.perf_counter() - started)
+            queries.append(statements[0])
+            status = response.status_code
+
+        # Memory is traced in a separate pass; tracing would skew the timings
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        request(scenario)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+
+        results[scenario.name] = {
+            'status': status,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+        print(f'{scenario.name:28} {status}  p50 {results[scenario.name]["p50_ms"]:8.1f}ms  '
+              f'p95 {results[scenario.name]["p95_ms"]:8.1f}ms  '
+              f'queries {results[scenario.name]["queries"]:3}  '
+              f'peak {results[scenario.name]["peak_kib"]:9.1f}KiB', file=sys.stderr)
+    return results
+
+
+def fleet_size():
+    from models import db, Equipment, MaintenanceRequest, MaintenanceTeam, Technician
+    return {
+        model.__tablename__: db.session.query(model).count()
+        for model in (MaintenanceTeam, Technician, Equipment, MaintenanceRequest)
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against a baseline: slower p95 beyond tolerance, or more queries"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline['scenarios'].get(name)
+        if not before:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {before["p95_ms"]}ms -> {result["p95_ms"]}ms')
+        if result['queries'] > before['queries']:
+            regressions.append(f'{name}: queries {before["queries"]} -> {result["queries"]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', required=True, help='a database seeded by bench.fleet')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON to check these results against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        size = fleet_size()
+        dialect = db.engine.dialect.name
+
+    results = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'database': dialect,
+            'fleet': size,
+            'iterations': args.iterations,
+            'python': platform.python_version(),
+        },
+        'scenarios': run(app, args.iterations, args.warmup),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Wrote {args.output}', file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results['scenarios'], json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Login throughput under concurrency.
+
+Starts the app against a throwaway SQLite database, creates users, and
+has --concurrency threads log in --logins times in total, reporting
+throughput, latency percentiles and how many logins were shed with 503.
+
+    python -m bench.login --concurrency 32 --logins 200 --pool-size 2 --queue-depth 8
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from bench import percentile, use_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--logins', type=int, default=160)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--pool-size', type=int, default=0, help='0 means one thread per CPU')
+    parser.add_argument('--queue-depth', type=int, default=32)
+    parser.add_argument('--method', default='pbkdf2:sha256:600000', help='PASSWORD_HASH_METHOD')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gearguard-bench-')
+    use_database(f'sqlite:///{os.path.join(workdir, "bench.db")}')
+
+    from app import create_app
+    from commands import upgrade_schema
+    from models import db, User
+    from werkzeug.security import generate_password_hash
+
+    app = create_app({
+        'PASSWORD_HASH_METHOD': args.method,
+        'PASSWORD_POOL_SIZE': args.pool_size or None,
+        'PASSWORD_QUEUE_DEPTH': args.queue_depth,
+    })
+
+    with app.app_context():
+        upgrade_schema()
+        password_hash = generate_password_hash('bench-password', args.method)
+        db.session.add_all(
+            User(name=f'Tech {i}', email=f'tech{i}@bench.local', role='Technician', password_hash=password_hash)
+            for i in range(args.users)
+        )
+        db.session.commit()
+
+    latencies, statuses = [], []
+    lock = threading.Lock()
+    remaining = iter(range(args.logins))
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                n = next(remaining, None)
+            if n is None:
+                return
+            started = time.perf_counter()
+            response = client.post('/login', data={
+                'email': f'tech{n % args.users}@bench.local',
+                'password': 'bench-password',
+            })
+            elapsed = time.perf_counter() - started
+            # Log out again so the next login is a real one
+            client.get('/logout')
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    ok = statuses.count(302)
+    shed = statuses.count(503)
+    print(f'logins: {len(statuses)}  ok: {ok}  shed (503): {shed}  other: {len(statuses) - ok - shed}')
+    print(f'wall: {wall:.2f}s  successful logins/s: {ok / wall:.1f}')
+    print(f'latency p50: {percentile(latencies, 50) * 1000:.0f}ms  '
+          f'p95: {percentile(latencies, 95) * 1000:.0f}ms  '
+          f'mean: {statistics.mean(latencies) * 1000:.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Served throughput: debug server vs flask serve.
+
+Starts the app both ways against an already seeded database (see
+bench.fleet) and has --concurrency client threads fetch --urls as an
+Admin for --seconds each: first the debug server that `python app.py`
+runs, then `flask serve` with --workers. During the second run --boards
+Kanban event streams stay open, the master is sent HUP --reloads times
+and --max-requests keeps recycling workers; every failed request is
+counted, as are event streams cut off rather than closed by the server.
+
+    python -m bench.serve --database-url sqlite:///bench.db --workers 4 --seconds 20
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from bench import percentile
+
+DEFAULT_URLS = '/dashboard/kanban,/equipment/,/teams/,/dashboard/calendar'
+
+DEBUG_SERVER = """
+import sys
+from app import create_app
+create_app().run(debug=True, host='127.0.0.1', port=int(sys.argv[1]))
+"""
+
+
+def _session_cookie(database_url):
+    # Signed the way the app signs its own, so no login round trip is needed
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app
+
+    app = create_app()
+    serializer = app.session_interface.get_signing_serializer(app)
+    return f"{app.config.get('SESSION_COOKIE_NAME', 'session')}={serializer.dumps({'user_id': 1, 'role': 'Admin'})}"
+
+
+def _wait_until_up(port, deadline=30):
+    stop = time.monotonic() + deadline
+    while time.monotonic() < stop:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/login')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f'server on port {port} did not start')
+
+
+def _load(port, urls, cookie, concurrency, seconds, during=None):
+    latencies, failures = [], []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client(offset):
+        n = offset
+        while time.monotonic() < stop:
+            url = urls[n % len(urls)]
+            n += 1
+            started = time.perf_counter()
+            try:
+                # A fresh connection per request, as the debug server closes them anyway
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                connection.request('GET', url, headers={'Cookie': cookie})
+                response = connection.getresponse()
+                response.read()
+                connection.close()
+                ok = response.status == 200
+                outcome = response.status
+            except OSError as exc:
+                ok, outcome = False, type(exc).__name__
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    failures.append(outcome)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    if during:
+        during(seconds)
+    for thread in threads:
+        thread.join()
+    return latencies, failures, time.perf_counter() - started
+
+
+def _hold_boards(port, cookie, boards, seconds):
+    """Keep event streams open; returns (streams closed by the server, streams broken)"""
+    counts = {'closed': 0, 'broken': 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+    request = (f'GET /dashboard/kanban/events HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+               f'Cookie: {cookie}\r\nAccept: text/event-stream\r\n\r\n').encode()
+
+    def board():
+        while time.monotonic() < stop:
+            outcome = None
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+                    sock.sendall(request)
+                    sock.settimeout(1)
+                    while time.monotonic() < stop:
+                        try:
+                            data = sock.recv(65536)
+                            # EOF, or the last chunk of a kept-alive response
+                            if not data or data.endswith(b'0\r\n\r\n'):
+                                outcome = 'closed'
+                                break
+                        except socket.timeout:
+                            continue
+            except OSError:
+                outcome = 'broken'
+            if outcome:
+                with lock:
+                    counts[outcome] += 1
+
+    threads = [threading.Thread(target=board, daemon=True) for _ in range(boards)]
+    for thread in threads:
+        thread.start()
+    return threads, counts
+
+
+def _report(label, latencies, failures, elapsed):
+    ms = [v * 1000 for v in latencies]
+    print(f'{label:26} {len(latencies) / elapsed:8.1f} req/s  p50 {percentile(ms, 50):7.1f}ms  '
+          f'p99 {percentile(ms, 99):7.1f}ms  failed {len(failures)}')
+    if failures:
+        print(f'{"":26} failures: {sorted(set(map(str, failures)))}')
+
+
+def _start(command, env):
+    # Own session, so the debug server's reloader child is stopped with it
+    return subprocess.Popen(command, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _stop(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', required=True, help='a database seeded by bench.fleet')
+    parser.add_argument('--urls', default=DEFAULT_URLS, help='comma-separated paths')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--boards', type=int, default=20, help='event streams held open during serve')
+    parser.add_argument('--max-requests', type=int, default=500)
+    parser.add_argument('--reloads', type=int, default=2, help='HUPs sent to the master mid-run')
+    args = parser.parse_args()
+
+    urls = args.urls.split(',')
+    cookie = _session_cookie(args.database_url)
+    env = dict(os.environ, DATABASE_URL=args.database_url, OVERDUE_SWEEP_SECONDS='0')
+
+    debug = _start([sys.executable, '-c', DEBUG_SERVER, str(args.port)], env)
+    try:
+        _wait_until_up(args.port)
+        _report('debug server', *_load(args.port, urls, cookie, args.concurrency, args.seconds))
+    finally:
+        _stop(debug)
+
+    pidfile = os.path.join(tempfile.mkdtemp(prefix='gearguard-bench-'), 'serve.pid')
+    served = _start([
+        sys.executable, '-m', 'flask', '--app', 'app', 'serve', '--bind', f'127.0.0.1:{args.port}',
+        '--workers', str(args.workers),
+        '--max-requests', str(args.max_requests), '--pidfile', pidfile,
+    ], env)
+
+    def reload_midway(seconds):
+        for _ in range(args.reloads):
+            time.sleep(seconds / (args.reloads + 1))
+            with open(pidfile) as f:
+                os.kill(int(f.read()), signal.SIGHUP)
+
+    try:
+        _wait_until_up(args.port)
+        boards, streams = _hold_boards(args.port, cookie, args.boards, args.seconds)
+        label = f'serve {args.workers} workers, {args.reloads} HUP'
+        _report(label, *_load(args.port, urls, cookie, args.concurrency, args.seconds, during=reload_midway))
+        for thread in boards:
+            thread.join()
+        print(f'{args.boards} open boards: streams closed by the server {streams["closed"]}, '
+              f'broken {streams["broken"]}')
+    finally:
+        _stop(served)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Worker startup time.
+
+Cold start: --runs fresh interpreters each import the app module and
+call create_app(), pointed at a database server that isn't there, to
+show startup needs no database. Fork: like a preloading server, this
+process builds the app once and forks --workers children. Each child
+reports how long it took from the fork to answering its first request
+that reads the database.
+
+    python -m bench.startup --runs 5 --workers 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from bench import percentile, use_database
+
+# Opening this fails (no such directory); try e.g. a MySQL URL on a port nothing listens on
+UNREACHABLE_DATABASE = 'sqlite:////nonexistent-gearguard-dir/gearguard.db'
+
+COLD_START = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported}))
+"""
+
+
+def cold_starts(runs, database_url):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    results = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', COLD_START], env=env, check=True,
+            capture_output=True, text=True, cwd=os.getcwd()
+        ).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        timings['process'] = time.perf_counter() - started
+        results.append(timings)
+    return results
+
+
+def forks(workers):
+    workdir = tempfile.mkdtemp(prefix='gearguard-bench-')
+    use_database(f'sqlite:///{os.path.join(workdir, "bench.db")}')
+    from app import create_app
+    from commands import upgrade_schema
+    from models import db
+
+    app = create_app({'OVERDUE_SWEEP_SECONDS': 0})
+    with app.app_context():
+        upgrade_schema()
+        # A preloading server must not hand pooled connections to its workers
+        db.engine.dispose()
+
+    timings = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        forked = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = app.test_client().get('/teams/').status_code
+            os.write(write_fd, json.dumps({
+                'ready': time.perf_counter() - forked, 'status': status
+            }).encode())
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            timings.append(json.loads(pipe.read()))
+        os.waitpid(pid, 0)
+    return timings
+
+
+def _summary(label, values):
+    values = [v * 1000 for v in values]
+    print(f'{label:34} p50 {percentile(values, 50):8.1f}ms  max {max(values):8.1f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--unreachable-url', default=UNREACHABLE_DATABASE,
+                        help='database the cold starts are pointed at; it must not be reachable')
+    args = parser.parse_args()
+
+    cold = cold_starts(args.runs, args.unreachable_url)
+    _summary('cold: import app', [r['import'] for r in cold])
+    _summary('cold: create_app()', [r['create_app'] for r in cold])
+    _summary('cold: whole interpreter', [r['process'] for r in cold])
+
+    if hasattr(os, 'fork'):
+        forked = forks(args.workers)
+        _summary('fork -> first DB-backed response', [r['ready'] for r in forked])
+        failed = [r['status'] for r in forked if r['status'] != 200]
+        if failed:
+            print(f'{len(failed)} workers answered with {sorted(set(failed))}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+GearGuard - Preventive maintenance calendar data
+
+Ranges cover the archive as well as the live table, so past months keep
+the preventive work that was done in them. Archived entries are flagged:
+they can be shown but no longer edited.
+"""
+import hashlib
+from sqlalchemy import func, literal, select
+from archive import history_statements
+from etags import table_state
+from models import db, Equipment, MaintenanceRequest, Technician
+
+# Longest span one /dashboard/calendar/range call may cover
+MAX_RANGE_DAYS = 93
+
+
+def _in_range(model, start, end):
+    return (
+        model.request_type == 'Preventive',
+        model.scheduled_date >= start,
+        model.scheduled_date <= end,
+    )
+
+
+def range_validators(start, end):
+    """
+    (etag, last_modified) for the preventive requests scheduled in a range.
+
+    The requests come from one aggregate per table over its (request_type,
+    scheduled_date) index. The count catches deletions and requests moved
+    out of the range, which leave the latest updated_at untouched;
+    archiving moves rows unchanged, so it changes neither. The equipment
+    and technician table versions cover the names shown on each entry.
+    """
+    count, requests_modified = 0, None
+    for stmt in history_statements(lambda model: (
+        select(func.count(model.id), func.max(model.updated_at)).where(*_in_range(model, start, end))
+    )):
+        table_count, table_modified = db.session.execute(stmt).one()
+        count += table_count
+        requests_modified = max(filter(None, (requests_modified, table_modified)), default=None)
+    versions, names_modified = table_state('equipment', 'technician')
+
+    digest = hashlib.sha1(
+        f'{start}:{end}:{count}:{requests_modified}:{versions}'.encode()
+    ).hexdigest()
+    last_modified = max(filter(None, (requests_modified, names_modified)), default=None)
+    return digest, last_modified
+
+
+def range_statements(start, end):
+    """The joined SELECT per table (archive, then live) behind range_buckets"""
+    def build(model):
+        return (
+            select(
+                model.id,
+                model.subject,
+                model.scheduled_date,
+                Equipment.equipment_name,
+                Technician.name,
+                literal(model is not MaintenanceRequest).label('archived'),
+            )
+            .join(Equipment, Equipment.id == model.equipment_id)
+            .outerjoin(Technician, Technician.id == model.assigned_technician_id)
+            .where(*_in_range(model, start, end))
+        )
+
+    return history_statements(build)
+
+
+def range_buckets(start, end):
+    """Requests in a date range bucketed by ISO date, from one joined query per table"""
+    rows = [row for stmt in range_statements(start, end) for row in db.session.execute(stmt)]
+    # Archived rows keep their ids, so this is the order one table would give
+    rows.sort(key=lambda row: (row.scheduled_date, row.id))
+
+    buckets = {}
+    for request_id, subject, scheduled_date, equipment_name, technician_name, archived in rows:
+        buckets.setdefault(scheduled_date.isoformat(), []).append({
+            'id': request_id,
+            'subject': subject,
+            'equipment': equipment_name,
+            'technician': technician_name,
+            'archived': bool(archived),
+        })
+    return buckets
@@ -0,0 +1,59 @@
+"""
+GearGuard - Commit-time change notifications
+
+Records which tables a session wrote to, through the unit of work or
+through bulk UPDATE/DELETE/INSERT statements, and hands that set to the
+registered listeners once the transaction has committed. Rolled back
+work is forgotten. Bulk statements run with the execution option
+track_changes=False (denormalized counters, say) are not recorded.
+"""
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_listeners = []
+
+
+def on_commit(*tables):
+    """Register fn(changed_tables) to run after commits touching any of tables"""
+    def decorator(fn):
+        _listeners.append((frozenset(tables), fn))
+        return fn
+    return decorator
+
+
+def touch(session, *tables):
+    """Mark tables as changed by writes the ORM cannot see"""
+    session.info.setdefault('changed_tables', set()).update(tables)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flush(session, flush_context):
+    touch(session, *{
+        obj.__table__.name
+        for obj in chain(session.new, session.dirty, session.deleted)
+    })
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_bulk(orm_execute_state):
+    if orm_execute_state.is_select or orm_execute_state.bind_mapper is None:
+        return
+    if not orm_execute_state.execution_options.get('track_changes', True):
+        return
+    touch(orm_execute_state.session, orm_execute_state.bind_mapper.local_table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify(session):
+    changed = session.info.pop('changed_tables', None)
+    if not changed:
+        return
+    for tables, fn in _listeners:
+        if not tables or tables & changed:
+            fn(changed)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard(session, previous_transaction):
+    session.info.pop('changed_tables', None)
@@ -0,0 +1,188 @@
+"""
+GearGuard - Management commands
+"""
+import os
+import sys
+import click
+import migrations
+from models import db, Equipment
+
+
+def upgrade_schema():
+    """Create missing tables, then apply pending migrations; returns the migrations run"""
+    db.create_all()
+    return migrations.upgrade(db.engine)
+
+
+def register_commands(app):
+    """Attach GearGuard's CLI commands to the app"""
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Create missing tables, then apply pending schema migrations."""
+        ran = upgrade_schema()
+        for version, name in ran:
+            click.echo(f'Applied {version:04d} {name}')
+        click.echo('Schema is up to date.')
+
+    @app.cli.command('serve', add_help_option=False,
+                     context_settings={'ignore_unknown_options': True, 'allow_extra_args': True})
+    @click.argument('args', nargs=-1, type=click.UNPROCESSED)
+    def serve_command(args):
+        """Serve the app with preforked gevent workers (options: serve --help)."""
+        # A fresh interpreter, so gevent is patched in before the app is imported
+        os.execv(sys.executable, [sys.executable, '-m', 'server', *args])
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """EXPLAIN each route's main query and fail on full table scans."""
+        from query_plans import SUPPORTED_DIALECTS, check_query_plans
+
+        dialect = db.engine.dialect.name
+        if dialect not in SUPPORTED_DIALECTS:
+            raise click.ClickException(
+                f'Query plans can only be checked on {" or ".join(SUPPORTED_DIALECTS)}, not {dialect}.'
+            )
+        failed = False
+        for name, scans in check_query_plans():
+            if scans:
+                failed = True
+                click.echo(f'FAIL {name}: full scan of {", ".join(scans)}')
+            else:
+                click.echo(f'ok   {name}')
+        if failed:
+            sys.exit(1)
+
+    @app.cli.command('import-csv')
+    @click.argument('kind', type=click.Choice(['equipment', 'requests']))
+    @click.argument('csv_file', type=click.File('rb'))
+    @click.option('--dry-run', is_flag=True, help='Validate every row without inserting.')
+    def import_csv(kind, csv_file, dry_run):
+        """Bulk import equipment or maintenance requests from a CSV file."""
+        from importer import IMPORTERS
+
+        report = IMPORTERS[kind](csv_file, dry_run=dry_run)
+        for error in report.errors:
+            click.echo(f"row {error['row']}: {error['error']}", err=True)
+        if report.error_count > len(report.errors):
+            click.echo(f'... {report.error_count - len(report.errors)} more errors', err=True)
+        verb = 'Validated' if dry_run else 'Imported'
+        click.echo(f'{verb} {report.inserted} of {report.rows} rows ({report.error_count} errors).')
+
+    @app.cli.command('recount-open-requests')
+    def recount_open_requests():
+        """Rebuild every equipment's open request counter from the requests table."""
+        updated = Equipment.recount_open_requests()
+        db.session.commit()
+        click.echo(f'Recounted open requests for {updated} equipment rows.')
+
+    @app.cli.command('archive-requests')
+    @click.option('--older-than', 'older_than', type=int, help='Days since last update (default ARCHIVE_AFTER_DAYS).')
+    @click.option('--batch-size', type=int, default=None, help='Requests moved per transaction.')
+    @click.option('--max-batches', type=int, default=None, help='Stop after this many batches.')
+    def archive_requests(older_than, batch_size, max_batches):
+        """Move old Repaired and Scrap requests to the archive table."""
+        from archive import ARCHIVE_BATCH_SIZE, archive_closed_requests
+
+        days = older_than if older_than is not None else app.config['ARCHIVE_AFTER_DAYS']
+        moved = archive_closed_requests(days, batch_size=batch_size or ARCHIVE_BATCH_SIZE, max_batches=max_batches)
+        click.echo(f'Archived {moved} closed requests last updated over {days} days ago.')
+
+    @app.cli.command('sweep-overdue')
+    def sweep_overdue():
+        """Flag open requests whose scheduled date has passed."""
+        from overdue import sweep
+
+        click.echo(f'Flagged {sweep()} overdue requests.')
+
+    @app.cli.command('add-recurrence')
+    @click.argument('subject')
+    @click.option('--every', 'interval', type=int, required=True, help='Interval between occurrences.')
+    @click.option('--unit', type=click.Choice(['days', 'months']), default='days')
+    @click.option('--equipment-id', type=int, help='One asset; omit for a department or the whole fleet.')
+    @click.option('--department', help='Every asset in this department.')
+    @click.option('--starts-on', type=click.DateTime(['%Y-%m-%d']), help='First occurrence (default today).')
+    @click.option('--priority', type=click.Choice(['High', 'Medium', 'Low']), default='Medium')
+    def add_recurrence(subject, interval, unit, equipment_id, department, starts_on, priority):
+        """Add a preventive maintenance plan and expand it."""
+        from models import RecurrenceRule
+        from overdue import today
+        from recurrence import expand_rules
+
+        if interval < 1:
+            raise click.BadParameter('must be at least 1', param_hint='--every')
+        if equipment_id and department:
+            raise click.UsageError('Give --equipment-id or --department, not both.')
+        if equipment_id and db.session.get(Equipment, equipment_id) is None:
+            raise click.BadParameter(f'no equipment {equipment_id}', param_hint='--equipment-id')
+
+        rule = RecurrenceRule(
+            subject=subject, interval=interval, unit=unit, equipment_id=equipment_id,
+            department=department, starts_on=starts_on.date() if starts_on else today(),
+            priority=priority
+        )
+        db.session.add(rule)
+        db.session.commit()
+        created = expand_rules(app.config['RECURRENCE_HORIZON_DAYS'], rule_ids=[rule.id])
+        click.echo(f'Added rule {rule.id}; created {created} requests.')
+
+    @app.cli.command('expand-recurrences')
+    @click.option('--horizon-days', type=int, default=None, help='Days ahead to generate (default RECURRENCE_HORIZON_DAYS).')
+    def expand_recurrences(horizon_days):
+        """Generate preventive requests from every rule up to the horizon."""
+        from recurrence import expand_rules
+
+        horizon = horizon_days if horizon_days is not None else app.config['RECURRENCE_HORIZON_DAYS']
+        click.echo(f'Created {expand_rules(horizon)} preventive requests.')
+
+    @app.cli.command('assign-unassigned')
+    @click.option('--limit', type=int, default=None, help='Assign at most this many requests.')
+    def assign_unassigned_command(limit):
+        """Assign open, unassigned requests to the least-loaded technician of their team."""
+        from assignment import assign_unassigned
+
+        click.echo(f'Assigned {assign_unassigned(limit)} requests.')
+
+    @app.cli.command('flush-status-log')
+    def flush_status_log():
+        """Load spooled status history into the database (after an outage or crash)."""
+        from status_log import load_spool
+
+        loaded = load_spool(app.config['STATUS_LOG_SPOOL_DIR'], claimed_too=True)
+        click.echo(f'Loaded {loaded} spooled status transitions.')
+
+    @app.cli.command('status-report')
+    @click.option('--days', type=int, default=30, show_default=True, help='Stays that ended within this many days.')
+    @click.option('--request-id', type=int, default=None, help='Show one request\'s history instead.')
+    def status_report(days, request_id):
+        """Hours spent in each status, or one request's status history."""
+        from datetime import datetime, timedelta
+        from status_log import history, time_in_state
+
+        if request_id is not None:
+            for transition in history(request_id):
+                by = f' by user {transition.changed_by}' if transition.changed_by else ''
+                click.echo(f'{transition.changed_at:%Y-%m-%d %H:%M:%S}  '
+                           f'{transition.from_status or "?"} -> {transition.to_status}{by}')
+            return
+        for status, figures in time_in_state(datetime.utcnow() - timedelta(days=days)).items():
+            click.echo(f'{status:12} {figures["stays"]:8} stays  mean {figures["mean_hours"]:9.2f}h  '
+                       f'total {figures["total_hours"]:11.2f}h')
+
+    @app.cli.command('sync-sqlite-replicas')
+    def sync_sqlite_replicas():
+        """Copy a SQLite primary over its SQLite replicas (local replica testing)."""
+        import sqlite3
+        from sqlalchemy.engine import make_url
+
+        primary = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        replicas = [make_url(uri) for uri in app.config['SQLALCHEMY_REPLICA_URIS']]
+        if primary.get_backend_name() != 'sqlite' or any(r.get_backend_name() != 'sqlite' for r in replicas):
+            raise click.ClickException('Only SQLite primaries and replicas can be synced this way.')
+
+        db.session.remove()
+        with sqlite3.connect(db.engine.url.database) as source:
+            for replica in replicas:
+                with sqlite3.connect(replica.database) as target:
+                    source.backup(target)
+                click.echo(f'Synced {replica.database}')
@@ -1,6 +1,19 @@
 import os
 
 
+def engine_options(url):
+    """Per-process connection pool settings; SQLite keeps its driver defaults"""
+    if url.startswith('sqlite'):
+        return {}
+    return {
+        # Connections one worker process uses at once; further requests wait for one
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        # Test connections on checkout and retire them before the server or a proxy drops them
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+
 
 class Config:
     # MySQL Database Configuration
@@ -11,6 +24,56 @@ class Config:
     MYSQL_PORT = os.environ.get('MYSQL_PORT', '3306')
     MYSQL_DB = os.environ.get('MYSQL_DB', 'gearguard')
     
-    SQLALCHEMY_DATABASE_URI = f'mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}'
+    # DATABASE_URL overrides the MySQL settings, e.g. sqlite:///gearguard.db for local work
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLALCHEMY_ENGINE_OPTIONS defaults to engine_options() of the final URI, set in create_app.
+    # Each worker process has its own pool: workers x (pool_size + max_overflow) must fit the server's max_connections
+
+    # Comma-separated read replica URLs; views marked @read_only read from them
+    # (SQLALCHEMY_BINDS is built from them in create_app)
+    SQLALCHEMY_REPLICA_URIS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+    # After writing, a user's reads stay on the primary this long to cover replica lag
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    # Password hashing: method for new hashes (older ones are upgraded at login)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    # Threads hashing at once per process (default: CPU count), and how many more logins may wait
+    PASSWORD_POOL_SIZE = int(os.environ.get('PASSWORD_POOL_SIZE', 0)) or None
+    PASSWORD_QUEUE_DEPTH = int(os.environ.get('PASSWORD_QUEUE_DEPTH', 32))
+    PASSWORD_WAIT_SECONDS = float(os.environ.get('PASSWORD_WAIT_SECONDS', 5))
+
+    # Log requests that run one statement this many times (likely N+1 queries); unset disables
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 0)) or None
+
+    # Repaired/Scrap requests untouched this many days move to the archive table (flask archive-requests)
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+
+    # How often each process checks for requests that have become overdue; 0 leaves it to `flask sweep-overdue`
+    OVERDUE_SWEEP_SECONDS = int(os.environ.get('OVERDUE_SWEEP_SECONDS', 300))
+
+    # How far ahead `flask expand-recurrences` generates preventive requests
+    RECURRENCE_HORIZON_DAYS = int(os.environ.get('RECURRENCE_HORIZON_DAYS', 90))
+
+    # Status history is queued per process and written in batches this often; batches the
+    # database refuses, and anything queued at exit, are spooled here (default instance/status-log)
+    STATUS_LOG_FLUSH_SECONDS = float(os.environ.get('STATUS_LOG_FLUSH_SECONDS', 1))
+    STATUS_LOG_BATCH_SIZE = int(os.environ.get('STATUS_LOG_BATCH_SIZE', 500))
+    STATUS_LOG_SPOOL_DIR = os.environ.get('STATUS_LOG_SPOOL_DIR') or None
+
+    # Redis URL (e.g. redis://localhost:6379/0) that shares live Kanban events between worker
+    # processes; unset keeps them in-process, which only suits a single process
+    EVENT_BROKER_URL = os.environ.get('EVENT_BROKER_URL')
+
+    # Rendered Kanban cards kept per process; watch the hit rate at /dashboard/api/cache-stats
+    KANBAN_CARD_CACHE_SIZE = int(os.environ.get('KANBAN_CARD_CACHE_SIZE', 5000))
+
+    # flask serve: worker processes (default 2 x CPUs + 1), requests (open event streams
+    # included) per worker at once, and requests a worker serves before it is gracefully
+    # replaced (0 never recycles)
+    SERVER_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 0)) or None
+    SERVER_CONNECTIONS = int(os.environ.get('SERVER_CONNECTIONS', 1000))
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 1000))
+
+    # Folded into page ETags; set it per release so cached pages from old templates are dropped
+    ETAG_SALT = os.environ.get('RELEASE', '')
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')    
\ No newline at end of file
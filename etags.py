@@ -0,0 +1,113 @@
+"""
+GearGuard - Conditional GET with ETags
+
+Every commit bumps a counter in table_version for each tracked table it
+wrote, so an ETag built from those counters changes exactly when the
+data behind a page might have. Revalidations are answered with a 304
+after one primary-key read, before the view queries or renders anything.
+
+Writers to a tracked table serialize briefly on its counter row. Equipment's
+open request counter moves with every request created or moved between
+statuses, so it has a counter row of its own (OPEN_REQUEST_COUNTS): those
+writes don't expire pages that only show equipment details, and only
+the pages that show the count depend on it.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import current_app, make_response, request, session as user_session
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from models import db, insert_ignoring_duplicates, OPEN_REQUEST_COUNTS, TableVersion
+
+# Tables whose versions pages can depend on
+TRACKED_TABLES = ('equipment', 'maintenance_team', 'technician', OPEN_REQUEST_COUNTS)
+
+_versions = TableVersion.__table__
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_versions(session):
+    # before_commit runs ahead of commit's own flush; flush now to see every write
+    session.flush()
+    changed = sorted(set(TRACKED_TABLES) & session.info.get('changed_tables', set()))
+    if not changed:
+        return
+
+    now = datetime.utcnow()
+    bump = update(_versions).values(version=_versions.c.version + 1, changed_at=now)
+    result = session.execute(bump.where(_versions.c.table_name.in_(changed)))
+    if result.rowcount < len(changed):
+        # First write to a table in a database that predates its counter row
+        seed = insert_ignoring_duplicates(_versions, session.get_bind())
+        existing = set(session.scalars(
+            select(_versions.c.table_name).where(_versions.c.table_name.in_(changed))
+        ))
+        missing = [name for name in changed if name not in existing]
+        session.execute(seed, [{'table_name': name, 'version': 1, 'changed_at': now} for name in missing])
+
+
+def table_versions(*tables):
+    """Current counter of each table, 0 for tables never written"""
+    return table_state(*tables)[0]
+
+
+def table_state(*tables):
+    """(table_versions(*tables), when the latest of them changed or None), in one read"""
+    rows = {
+        name: (version, changed_at)
+        for name, version, changed_at in db.session.execute(
+            select(_versions.c.table_name, _versions.c.version, _versions.c.changed_at)
+            .where(_versions.c.table_name.in_(tables))
+        )
+    }
+    changed = [rows[table][1] for table in tables if table in rows and rows[table][1]]
+    return [rows.get(table, (0, None))[0] for table in tables], max(changed, default=None)
+
+
+def make_etag(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def not_modified(etag):
+    response = make_response('', 304)
+    return set_validators(response, etag)
+
+
+def set_validators(response, etag):
+    response.set_etag(etag)
+    # Clients keep the body but revalidate before every reuse
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(*tables):
+    """
+    Answer GETs of a view with an ETag over the tables it reads.
+
+    The ETag also covers the URL with its query string, the user's role
+    (which changes the navigation) and ETAG_SALT, so a deploy invalidates
+    pages rendered by the old templates. Responses carrying a flashed
+    message are never answered with a 304, since the flash is consumed
+    when the page renders.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method != 'GET' or '_flashes' in user_session:
+                return view(*args, **kwargs)
+
+            etag = make_etag(
+                current_app.config.get('ETAG_SALT', ''), request.full_path,
+                user_session.get('role'), *table_versions(*tables)
+            )
+            if etag in request.if_none_match:
+                return not_modified(etag)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                set_validators(response, etag)
+            return response
+        return wrapped
+    return decorator
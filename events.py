@@ -0,0 +1,297 @@
+"""
+GearGuard - Live change feed
+
+Card and equipment writes are turned into compact events when the
+session flushes, held until the transaction commits, and then handed to
+the broker, which fans them out to every open Server-Sent Events stream.
+Rolled back work publishes nothing.
+
+The default broker lives in this process, which is all a single-process
+deployment needs. With several worker processes (flask serve), set
+EVENT_BROKER_URL to a Redis server so every worker sees every change.
+Anything with the same publish()/subscribe() methods can replace either
+through set_broker(), e.g. a stand-in that records events.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from itertools import chain
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import Equipment, MaintenanceRequest
+
+# Events kept for clients reconnecting with Last-Event-ID
+REPLAY_SIZE = 1000
+
+# Events a slow subscriber may fall behind before it is told to reload
+SUBSCRIBER_BACKLOG = 1000
+
+# Sent when a client can't be caught up event by event
+RELOAD = {'type': 'reload'}
+
+# Returned by Subscription.get() once the broker has closed the stream
+CLOSED = object()
+
+log = logging.getLogger(__name__)
+
+
+class Broker:
+    """Interface every broker implements"""
+
+    def publish(self, event):
+        """Deliver an event dict to all current subscribers"""
+        raise NotImplementedError
+
+    def subscribe(self, last_event_id=None):
+        """
+        Return a subscription: get(timeout) yields (event_id, event),
+        None on timeout or CLOSED once close_streams() ran, and close()
+        ends it.
+        """
+        raise NotImplementedError
+
+    def close_streams(self):
+        """End every open subscription, e.g. because this process is stopping"""
+
+
+class _Subscription:
+    def __init__(self, broker):
+        self._broker = broker
+        self._queue = queue.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        self._overflowed = False
+        self._closed = False
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._overflowed = True
+
+    def _close(self):
+        self._closed = True
+        # Wake a waiting get(); a full queue wakes it anyway
+        self._put(CLOSED)
+
+    def get(self, timeout=None):
+        if self._closed:
+            return CLOSED
+        if self._overflowed:
+            self._overflowed = False
+            # Whatever is still queued is superseded by the reload
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return None, RELOAD
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return CLOSED if self._closed else item
+
+    def close(self):
+        self._broker._unsubscribe(self)
+
+
+class InProcessBroker(Broker):
+    """Thread-safe fan-out to subscribers in this process"""
+
+    def __init__(self, replay_size=REPLAY_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._last_id = 0
+
+    def publish(self, event):
+        with self._lock:
+            self._deliver(self._last_id + 1, event)
+
+    def _deliver(self, event_id, event):
+        # Caller holds the lock
+        self._last_id = event_id
+        item = (event_id, event)
+        self._recent.append(item)
+        for subscription in self._subscribers:
+            subscription._put(item)
+
+    def subscribe(self, last_event_id=None):
+        subscription = _Subscription(self)
+        with self._lock:
+            if last_event_id is not None and last_event_id != self._last_id:
+                missed = [item for item in self._recent if item[0] > last_event_id]
+                # Events older than the replay buffer, or from before a restart, are gone
+                if not missed or missed[0][0] != last_event_id + 1:
+                    subscription._put((self._last_id, RELOAD))
+                else:
+                    for item in missed:
+                        subscription._put(item)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def close_streams(self):
+        with self._lock:
+            subscriptions, self._subscribers = self._subscribers, set()
+        for subscription in subscriptions:
+            subscription._close()
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+# Numbers the event and appends it in one step, so ids are consecutive across processes
+_APPEND_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], id .. '-0', 'event', ARGV[1])
+return id
+"""
+
+
+class RedisBroker(Broker):
+    """
+    Shares events between processes through a Redis stream (pip install
+    redis). publish() appends to the stream; in each process one reader
+    thread follows it and fans events out to that process's subscribers
+    through an InProcessBroker, whose replay buffer it keeps filled, so a
+    board reconnecting to any worker resumes where it left off.
+    """
+
+    def __init__(self, url, key='gearguard:events', replay_size=REPLAY_SIZE):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._key = key
+        self._replay_size = replay_size
+        self._append = self._redis.register_script(_APPEND_SCRIPT)
+        self._local = InProcessBroker(replay_size)
+        self._reader_pid = None
+        self._reader_lock = threading.Lock()
+
+    def publish(self, event):
+        try:
+            self._append(keys=[f'{self._key}:seq', self._key], args=[json.dumps(event), self._replay_size])
+        except Exception:
+            # The commit stands; open boards catch up on their next reload
+            log.exception('Could not publish %s event', event.get('type'))
+
+    def subscribe(self, last_event_id=None):
+        self._ensure_reader()
+        return self._local.subscribe(last_event_id)
+
+    def subscriber_count(self):
+        return self._local.subscriber_count()
+
+    def close_streams(self):
+        self._local.close_streams()
+
+    def _ensure_reader(self):
+        # One reader per process, started after any fork
+        if self._reader_pid == os.getpid():
+            return
+        with self._reader_lock:
+            if self._reader_pid == os.getpid():
+                return
+            self._reader_pid = os.getpid()
+            threading.Thread(target=self._follow, name='event-reader', daemon=True).start()
+
+    def _deliver(self, entries):
+        with self._local._lock:
+            for entry_id, fields in entries:
+                self._local._deliver(int(entry_id.split(b'-')[0]), json.loads(fields[b'event']))
+
+    def _follow(self):
+        last = None
+        while True:
+            try:
+                if last is None:
+                    # Fill the replay buffer with the newest events first
+                    recent = self._redis.xrevrange(self._key, count=self._replay_size)[::-1]
+                    self._deliver(recent)
+                    last = recent[-1][0] if recent else b'0-0'
+                for _, entries in self._redis.xread({self._key: last}, block=5000) or []:
+                    self._deliver(entries)
+                    last = entries[-1][0]
+            except Exception:
+                log.exception('Event stream read failed; retrying')
+                time.sleep(1)
+
+
+def init_app(app):
+    """Share events through Redis when EVENT_BROKER_URL is set"""
+    url = app.config.get('EVENT_BROKER_URL')
+    if url:
+        set_broker(RedisBroker(url))
+
+
+_broker = InProcessBroker()
+
+
+def get_broker():
+    return _broker
+
+
+def set_broker(broker):
+    """Swap the broker, returning the previous one"""
+    global _broker
+    previous, _broker = _broker, broker
+    return previous
+
+
+# ---------------- COLLECTING EVENTS ----------------
+def publish_after_commit(session, event):
+    """Queue an event to be published if the session's transaction commits"""
+    session.info.setdefault('pending_events', []).append(event)
+
+
+def _card_event(req, deleted=False):
+    if deleted:
+        return {'type': 'card', 'op': 'delete', 'id': req.id, 'status': req.status}
+    # The status before this flush, so boards can fix the old column's count
+    previous = inspect(req).attrs.status.history.deleted
+    return {
+        'type': 'card', 'op': 'upsert', 'id': req.id,
+        'status': req.status, 'version': req.version_id,
+        'previous': previous[0] if previous else None,
+    }
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect(session, flush_context):
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, MaintenanceRequest):
+            if obj in session.new or session.is_modified(obj):
+                publish_after_commit(session, _card_event(obj))
+        elif isinstance(obj, Equipment) and session.is_modified(obj):
+            publish_after_commit(session, {'type': 'equipment', 'id': obj.id})
+
+    for obj in session.deleted:
+        if isinstance(obj, MaintenanceRequest):
+            publish_after_commit(session, _card_event(obj, deleted=True))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish(session):
+    pending = session.info.pop('pending_events', None)
+    if not pending:
+        return
+
+    # Several flushes may touch one card; only its last state matters
+    latest = {}
+    for item in pending:
+        key = (item['type'], item.get('id'))
+        if 'previous' in item and key in latest:
+            item = {**item, 'previous': latest[key].get('previous')}
+        latest[key] = item
+    for item in latest.values():
+        _broker.publish(item)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard(session, previous_transaction):
+    session.info.pop('pending_events', None)
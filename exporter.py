@@ -0,0 +1,183 @@
+"""
+GearGuard - Streaming CSV/NDJSON export
+
+Exports run as flat joined SELECTs read through a server-side cursor in
+yield_per batches and written out by a generator, so memory stays flat
+however large the table is.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from flask import Response, jsonify, request, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from models import db, Equipment, MaintenanceTeam, Technician
+from archive import history_statements
+
+YIELD_PER = 1000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ExportFilterError(ValueError):
+    pass
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ExportFilterError(f'{name} must be YYYY-MM-DD')
+
+
+def _parse_int(value, name):
+    try:
+        return int(value)
+    except ValueError:
+        raise ExportFilterError(f'{name} must be a number')
+
+
+# ---------------- QUERIES ----------------
+def request_export_query(args):
+    """
+    Requests joined with equipment, team and technician names, archived
+    history included (archived rows first, then live ones, each by id).
+
+    Filters mirror the UI: status (repeatable), start/end on the created
+    date, team_id and department.
+    """
+    statuses = args.getlist('status')
+    start = _parse_date(args['start'], 'start') if args.get('start') else None
+    end = _parse_date(args['end'], 'end') if args.get('end') else None
+    team_id = _parse_int(args['team_id'], 'team_id') if args.get('team_id') else None
+
+    def build(model):
+        stmt = select(
+            model.id,
+            model.subject,
+            model.request_type,
+            model.status,
+            model.priority,
+            model.scheduled_date,
+            model.duration_hours,
+            model.created_at,
+            model.updated_at,
+            Equipment.equipment_name,
+            Equipment.serial_number,
+            Equipment.department,
+            MaintenanceTeam.team_name,
+            Technician.name.label('technician_name'),
+        ).join(
+            Equipment, Equipment.id == model.equipment_id
+        ).join(
+            MaintenanceTeam, MaintenanceTeam.id == model.maintenance_team_id
+        ).outerjoin(
+            Technician, Technician.id == model.assigned_technician_id
+        )
+
+        if statuses:
+            stmt = stmt.where(model.status.in_(statuses))
+        if start:
+            stmt = stmt.where(model.created_at >= start)
+        if end:
+            stmt = stmt.where(model.created_at < datetime(end.year, end.month, end.day, 23, 59, 59, 999999))
+        if team_id is not None:
+            stmt = stmt.where(model.maintenance_team_id == team_id)
+        if args.get('department'):
+            stmt = stmt.where(Equipment.department == args['department'])
+        return stmt.order_by(model.id)
+
+    return history_statements(build, statuses)
+
+
+def equipment_export_query(args):
+    """Equipment joined with team and default technician names; filters: department, team_id, scrapped"""
+    default_technician = aliased(Technician)
+    stmt = select(
+        Equipment.id,
+        Equipment.equipment_name,
+        Equipment.serial_number,
+        Equipment.department,
+        Equipment.assigned_employee,
+        Equipment.location,
+        Equipment.purchase_date,
+        Equipment.warranty_expiry,
+        Equipment.is_scrapped,
+        Equipment.open_request_count,
+        MaintenanceTeam.team_name,
+        default_technician.name.label('default_technician_name'),
+    ).join(
+        MaintenanceTeam, MaintenanceTeam.id == Equipment.maintenance_team_id
+    ).outerjoin(
+        default_technician, default_technician.id == Equipment.default_technician_id
+    )
+
+    if args.get('department'):
+        stmt = stmt.where(Equipment.department == args['department'])
+    if args.get('team_id'):
+        stmt = stmt.where(Equipment.maintenance_team_id == _parse_int(args['team_id'], 'team_id'))
+    if args.get('scrapped') in ('0', '1'):
+        stmt = stmt.where(Equipment.is_scrapped == (args['scrapped'] == '1'))
+
+    return stmt.order_by(Equipment.id)
+
+
+# ---------------- STREAMING ----------------
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def stream_rows(stmts, fmt):
+    """
+    Yield the export as text chunks, one chunk per fetched batch.
+
+    `stmts` is a SELECT or a list of SELECTs with the same columns, read
+    one after another into a single export.
+    """
+    if not isinstance(stmts, (list, tuple)):
+        stmts = [stmts]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for index, stmt in enumerate(stmts):
+        result = db.session.execute(stmt.execution_options(yield_per=YIELD_PER))
+        columns = list(result.keys())
+        if fmt == 'csv' and index == 0:
+            writer.writerow(columns)
+
+        for partition in result.partitions():
+            for row in partition:
+                if fmt == 'csv':
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, row)), default=_json_default))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    # Header of an export with no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(build_query, filename):
+    """Streamed attachment response for ?format=csv|ndjson plus the query's filters"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'success': False, 'message': 'format must be csv or ndjson'}), 400
+
+    try:
+        stmt = build_query(request.args)
+    except ExportFilterError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    response = Response(stream_with_context(stream_rows(stmt, fmt)), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{fmt}'
+    return response
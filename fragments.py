@@ -0,0 +1,60 @@
+"""
+GearGuard - Kanban card fragment cache
+
+Rendering card markup is most of the work of a board render, and most
+cards have not changed since the last one. Rendered cards are kept per
+process in a bounded LRU (KANBAN_CARD_CACHE_SIZE entries) keyed on
+everything a card shows: the request's id, row version and overdue flag,
+its equipment's row version and the technician table's change counter.
+Writes bump those versions, so an edited card gets a new key and its
+old entry ages out unused.
+"""
+import threading
+from flask import current_app, g, render_template
+from markupsafe import Markup
+from cache import TTLCache
+from etags import table_versions
+
+DEFAULT_CACHE_SIZE = 5000
+
+_card_cache = None
+_cache_lock = threading.Lock()
+
+
+def _cache():
+    global _card_cache
+    if _card_cache is None:
+        with _cache_lock:
+            if _card_cache is None:
+                size = current_app.config.get('KANBAN_CARD_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+                _card_cache = TTLCache(maxsize=size)
+    return _card_cache
+
+
+def _technician_version():
+    # Read once per request, however many cards are rendered
+    if '_technician_version' not in g:
+        g._technician_version = table_versions('technician')[0]
+    return g._technician_version
+
+
+def card_key(req):
+    return (
+        req.id, req.version_id, bool(req.overdue),
+        req.equipment_id, req.equipment.version_id if req.equipment else None,
+        req.assigned_technician_id, _technician_version(),
+    )
+
+
+def render_card(req):
+    """A card's HTML, rendered or from the cache"""
+    return Markup(_cache().get_or_set(
+        card_key(req), lambda: render_template('kanban_card.html', req=req)
+    ))
+
+
+def cache_stats():
+    stats = _cache().stats()
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
@@ -0,0 +1,321 @@
+"""
+GearGuard - Bulk CSV import
+
+Streams a CSV one row at a time, validates each row against the model's
+column rules, and inserts valid rows in executemany batches. Team,
+technician and equipment names are resolved through lookup maps, so
+rows never trigger their own queries.
+
+Each batch commits on its own. A failed batch is rolled back and
+reported without stopping the rest of the file.
+"""
+import csv
+import io
+from datetime import datetime
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Equipment, MaintenanceRequest, MaintenanceTeam, Technician, OPEN_STATUSES
+from changes import touch
+from events import RELOAD, publish_after_commit
+from overdue import past_due
+from kanban import STATUSES as REQUEST_STATUSES
+
+BATCH_SIZE = 1000
+
+# Errors kept in the report; the total is always counted
+MAX_REPORTED_ERRORS = 1000
+
+REQUEST_TYPES = ['Corrective', 'Preventive']
+PRIORITIES = ['High', 'Medium', 'Low']
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+        }
+
+
+# ---------------- FIELD VALIDATION ----------------
+def _column_lengths(model):
+    return {
+        column.name: column.type.length
+        for column in model.__table__.columns
+        if getattr(column.type, 'length', None)
+    }
+
+
+_LENGTHS = {model: _column_lengths(model) for model in (Equipment, MaintenanceRequest)}
+
+
+def _text(row, model, field, required=False):
+    value = (row.get(field) or '').strip()
+    if not value:
+        if required:
+            raise RowError(f'{field} is required')
+        return None
+    length = _LENGTHS[model].get(field)
+    if length and len(value) > length:
+        raise RowError(f'{field} is longer than {length} characters')
+    return value
+
+
+def _date(row, field):
+    value = (row.get(field) or '').strip()
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise RowError(f'{field} must be YYYY-MM-DD')
+
+
+def _choice(row, field, choices, default):
+    value = (row.get(field) or '').strip() or default
+    if value not in choices:
+        raise RowError(f'{field} must be one of {", ".join(choices)}')
+    return value
+
+
+def _team_id(row, teams):
+    name = (row.get('maintenance_team') or '').strip()
+    if not name:
+        raise RowError('maintenance_team is required')
+    if name not in teams:
+        raise RowError(f'unknown maintenance_team "{name}"')
+    return teams[name]
+
+
+def _technician_id(row, field, team_id, technicians):
+    name = (row.get(field) or '').strip()
+    if not name:
+        return None
+    technician_id = technicians.get((team_id, name))
+    if technician_id is None:
+        raise RowError(f'{field} "{name}" is not in that team')
+    return technician_id
+
+
+# ---------------- LOOKUP MAPS ----------------
+def _team_map():
+    return dict(db.session.query(MaintenanceTeam.team_name, MaintenanceTeam.id))
+
+
+def _technician_map():
+    return {
+        (team_id, name): technician_id
+        for technician_id, team_id, name in db.session.query(
+            Technician.id, Technician.team_id, Technician.name
+        )
+    }
+
+
+# ---------------- BATCHING ----------------
+def _rows(stream):
+    """CSV rows as dicts, numbered as in a spreadsheet (header is row 1)"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    for number, row in enumerate(csv.DictReader(text), start=2):
+        yield number, row
+
+
+def _batches(rows):
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert_batch(report, batch, model, after_insert=None, dry_run=False):
+    """executemany-insert the validated (row_number, values) pairs of one batch"""
+    if not batch:
+        return
+    if dry_run:
+        report.inserted += len(batch)
+        return
+    try:
+        # Core insert: one executemany without per-row ORM bookkeeping
+        db.session.execute(insert(model.__table__), [values for _, values in batch])
+        touch(db.session, model.__tablename__)
+        if after_insert:
+            after_insert([values for _, values in batch])
+        db.session.commit()
+        report.inserted += len(batch)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        first, last = batch[0][0], batch[-1][0]
+        report.add_error(first, f'batch of rows {first}-{last} was not imported: {e.__class__.__name__}')
+
+
+# ---------------- EQUIPMENT ----------------
+def import_equipment(stream, dry_run=False):
+    """
+    Import equipment rows with columns equipment_name, serial_number,
+    location, maintenance_team and optionally department,
+    assigned_employee, purchase_date, warranty_expiry, default_technician.
+    """
+    report = ImportReport()
+    teams = _team_map()
+    technicians = _technician_map()
+
+    for raw_batch in _batches(_rows(stream)):
+        serials = {(row.get('serial_number') or '').strip() for _, row in raw_batch}
+        taken = set(db.session.scalars(
+            db.select(Equipment.serial_number).where(Equipment.serial_number.in_(serials))
+        ))
+
+        batch = []
+        for number, row in raw_batch:
+            report.rows += 1
+            try:
+                team_id = _team_id(row, teams)
+                values = {
+                    'equipment_name': _text(row, Equipment, 'equipment_name', required=True),
+                    'serial_number': _text(row, Equipment, 'serial_number', required=True),
+                    'department': _text(row, Equipment, 'department'),
+                    'assigned_employee': _text(row, Equipment, 'assigned_employee'),
+                    'purchase_date': _date(row, 'purchase_date'),
+                    'warranty_expiry': _date(row, 'warranty_expiry'),
+                    'location': _text(row, Equipment, 'location', required=True),
+                    'maintenance_team_id': team_id,
+                    'default_technician_id': _technician_id(row, 'default_technician', team_id, technicians),
+                    'is_scrapped': False,
+                    'open_request_count': 0,
+                }
+                if values['serial_number'] in taken:
+                    raise RowError(f'serial_number "{values["serial_number"]}" already exists')
+            except RowError as e:
+                report.add_error(number, str(e))
+                continue
+
+            taken.add(values['serial_number'])
+            batch.append((number, values))
+
+        _insert_batch(report, batch, Equipment, dry_run=dry_run)
+
+    return report
+
+
+# ---------------- MAINTENANCE REQUESTS ----------------
+def _apply_equipment_effects(rows):
+    """Fold a batch's open counts and scraps into equipment with executemany UPDATEs"""
+    deltas = {}
+    scrapped = set()
+    for values in rows:
+        if values['status'] in OPEN_STATUSES:
+            deltas[values['equipment_id']] = deltas.get(values['equipment_id'], 0) + 1
+        elif values['status'] == 'Scrap':
+            scrapped.add(values['equipment_id'])
+
+    table = Equipment.__table__
+    Equipment.adjust_open_requests_bulk(deltas)
+    if scrapped:
+        # Core UPDATEs skip version_id_col, so bump the row version as the ORM would
+        db.session.execute(
+            update(table)
+            .where(table.c.id.in_(scrapped))
+            .values(is_scrapped=True, version_id=table.c.version_id + 1)
+        )
+        # Scrapping is an equipment edit; counter moves are recorded apart
+        touch(db.session, table.name)
+    # Bulk inserts bypass the per-card feed; open boards reload instead
+    publish_after_commit(db.session, RELOAD)
+
+
+def import_requests(stream, dry_run=False):
+    """
+    Import maintenance requests with columns subject, request_type,
+    equipment_serial and optionally maintenance_team (defaults to the
+    equipment's team), assigned_technician, scheduled_date, duration_hours,
+    status and priority.
+    """
+    report = ImportReport()
+    teams = _team_map()
+    technicians = _technician_map()
+
+    for raw_batch in _batches(_rows(stream)):
+        serials = {(row.get('equipment_serial') or '').strip() for _, row in raw_batch}
+        equipment = {
+            serial: (equipment_id, team_id, is_scrapped)
+            for serial, equipment_id, team_id, is_scrapped in db.session.execute(
+                db.select(
+                    Equipment.serial_number, Equipment.id,
+                    Equipment.maintenance_team_id, Equipment.is_scrapped
+                ).where(Equipment.serial_number.in_(serials))
+            )
+        }
+
+        batch = []
+        for number, row in raw_batch:
+            report.rows += 1
+            try:
+                serial = (row.get('equipment_serial') or '').strip()
+                if serial not in equipment:
+                    raise RowError(f'unknown equipment_serial "{serial}"')
+                equipment_id, default_team_id, is_scrapped = equipment[serial]
+
+                status = _choice(row, 'status', REQUEST_STATUSES, 'New')
+                if is_scrapped and status in OPEN_STATUSES:
+                    raise RowError('cannot open a request for scrapped equipment')
+
+                team_id = _team_id(row, teams) if (row.get('maintenance_team') or '').strip() else default_team_id
+                request_type = _choice(row, 'request_type', REQUEST_TYPES, None)
+                scheduled_date = _date(row, 'scheduled_date')
+                if request_type == 'Preventive' and not scheduled_date:
+                    raise RowError('scheduled_date is required for Preventive requests')
+
+                duration = (row.get('duration_hours') or '').strip()
+                try:
+                    duration_hours = float(duration) if duration else None
+                except ValueError:
+                    raise RowError('duration_hours must be a number')
+
+                values = {
+                    'subject': _text(row, MaintenanceRequest, 'subject', required=True),
+                    'request_type': request_type,
+                    'equipment_id': equipment_id,
+                    'maintenance_team_id': team_id,
+                    'assigned_technician_id': _technician_id(row, 'assigned_technician', team_id, technicians),
+                    'scheduled_date': scheduled_date,
+                    'duration_hours': duration_hours,
+                    'status': status,
+                    'priority': _choice(row, 'priority', PRIORITIES, 'Medium'),
+                    'overdue': past_due(status, scheduled_date),
+                }
+            except RowError as e:
+                report.add_error(number, str(e))
+                continue
+
+            batch.append((number, values))
+
+        _insert_batch(report, batch, MaintenanceRequest, after_insert=_apply_equipment_effects, dry_run=dry_run)
+
+    return report
+
+
+IMPORTERS = {
+    'equipment': import_equipment,
+    'requests': import_requests,
+}
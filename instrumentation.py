@@ -0,0 +1,211 @@
+"""
+GearGuard - Request instrumentation
+
+Engine events time every SQL statement and template signals time every
+render, attributed to the request in progress. Each response carries a
+Server-Timing header (visible in the browser's network panel), and
+per-endpoint totals and latency histograms are served in Prometheus
+text format at /metrics to Admins. Metrics are per process; scrape
+every worker. Streamed responses are recorded once their body has been
+sent, so the queries that ran while streaming are counted.
+
+With N_PLUS_ONE_THRESHOLD set, a request that runs the same statement
+that many times or more is logged as a likely N+1 query.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from flask import Response, before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        # Templates rendered inside another render are timed by the outermost one
+        self.render_depth = 0
+        self.render_started = None
+        self.statements = Counter()
+
+
+def _current():
+    return g.get('_request_stats') if has_request_context() else None
+
+
+# ---------------- METRICS ----------------
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        cumulative += self.counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.total:.6f}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class Registry:
+    """Per-endpoint request metrics, safe to update from any thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.latency = {}
+        self.queries = {}
+        self.db_seconds = Counter()
+        self.render_seconds = Counter()
+        self.response_bytes = Counter()
+
+    def record(self, endpoint, method, status, stats, elapsed, size):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.latency.setdefault(endpoint, Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self.queries.setdefault(endpoint, Histogram(QUERY_BUCKETS)).observe(stats.queries)
+            self.db_seconds[endpoint] += stats.db_time
+            self.render_seconds[endpoint] += stats.render_time
+            if size is not None:
+                self.response_bytes[endpoint] += size
+
+    def render(self):
+        """Everything in Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# HELP gearguard_requests_total Requests handled.',
+                '# TYPE gearguard_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(
+                    f'gearguard_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}'
+                )
+
+            for name, help_text, histograms in (
+                ('gearguard_request_duration_seconds', 'Time to build a response.', self.latency),
+                ('gearguard_request_queries', 'SQL statements per request.', self.queries),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for endpoint, histogram in sorted(histograms.items()):
+                    lines.extend(histogram.lines(name, f'endpoint="{endpoint}"'))
+
+            for name, help_text, totals in (
+                ('gearguard_db_seconds_total', 'Time spent in SQL statements.', self.db_seconds),
+                ('gearguard_render_seconds_total', 'Time spent rendering templates.', self.render_seconds),
+                ('gearguard_response_bytes_total', 'Response body bytes, where the length is known.', self.response_bytes),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for endpoint, total in sorted(totals.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {total:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Registry()
+
+
+# ---------------- SQL ----------------
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        context._instrument_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    started = getattr(context, '_instrument_started', None)
+    if stats is None or started is None:
+        return
+    stats.queries += 1
+    stats.db_time += time.perf_counter() - started
+    # Parameters are bound separately, so identical text means the same statement shape
+    stats.statements[statement] += 1
+
+
+# ---------------- TEMPLATES ----------------
+def _render_started(sender, template, context, **extra):
+    stats = _current()
+    if stats is None:
+        return
+    if not stats.render_depth:
+        stats.render_started = time.perf_counter()
+    stats.render_depth += 1
+
+
+def _render_finished(sender, template, context, **extra):
+    stats = _current()
+    if stats is None or not stats.render_depth:
+        return
+    stats.render_depth -= 1
+    if not stats.render_depth:
+        stats.render_time += time.perf_counter() - stats.render_started
+
+
+# ---------------- REQUESTS ----------------
+def _start_request():
+    g._request_stats = RequestStats()
+
+
+def _finish_request(response):
+    stats = _current()
+    if stats is None or request.endpoint == 'metrics':
+        return response
+
+    # For a streamed response this only covers the work done before its body
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+        f'render;dur={stats.render_time * 1000:.1f}',
+        f'total;dur={(time.perf_counter() - stats.started) * 1000:.1f}',
+    ])
+
+    endpoint = request.endpoint or 'unmatched'
+    method, status = request.method, response.status_code
+    threshold = current_app.config.get('N_PLUS_ONE_THRESHOLD')
+    if not response.is_streamed:
+        _record(stats, endpoint, method, status, response.calculate_content_length(), threshold)
+    else:
+        # Streamed bodies have no length and are left out of the byte counts
+        response.call_on_close(lambda: _record(stats, endpoint, method, status, None, threshold))
+    return response
+
+
+def _record(stats, endpoint, method, status, size, threshold):
+    metrics.record(endpoint, method, status, stats, time.perf_counter() - stats.started, size)
+    if threshold:
+        for statement, count in stats.statements.items():
+            if count >= threshold:
+                log.warning('Possible N+1 in %s: statement ran %d times: %s',
+                            endpoint, count, ' '.join(statement.split())[:300])
+
+
+def _metrics_view():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Hook instrumentation into an app and add its Admin-only /metrics endpoint"""
+    from routes.dashboard import login_required
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    app.add_url_rule('/metrics', 'metrics', login_required(_metrics_view, role='Admin'))
@@ -0,0 +1,162 @@
+"""
+GearGuard - Kanban board data layer
+"""
+from sqlalchemy import case, func
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, Equipment, MaintenanceRequest
+from pagination import SortKey, keyset_page
+
+STATUSES = ['New', 'In Progress', 'Repaired', 'Scrap']
+
+# Cards rendered per column on first load; the rest come from "load more"
+COLUMN_LIMIT = 50
+
+PRIORITY_ORDER = {'High': 1, 'Medium': 2, 'Low': 3}
+
+PRIORITY_RANK = case(PRIORITY_ORDER, value=MaintenanceRequest.priority, else_=2)
+
+# Most moves one /requests/transitions call may carry
+MAX_TRANSITIONS = 500
+
+
+def _card_options():
+    """Eager-load everything a card template touches"""
+    return (
+        joinedload(MaintenanceRequest.equipment),
+        joinedload(MaintenanceRequest.assigned_technician),
+    )
+
+
+def column_keys(status):
+    """Keyset ordering of a column: New by priority, the others newest first"""
+    if status == 'New':
+        return [
+            SortKey(PRIORITY_RANK, value=lambda req: PRIORITY_ORDER.get(req.priority, 2)),
+            SortKey(MaintenanceRequest.id),
+        ]
+    return [
+        SortKey(MaintenanceRequest.created_at, descending=True),
+        SortKey(MaintenanceRequest.id, descending=True),
+    ]
+
+
+def _column_base_query():
+    return MaintenanceRequest.query.options(*_card_options())
+
+
+def _column_base(status):
+    return _column_base_query().filter(MaintenanceRequest.status == status)
+
+
+def column_query(status):
+    """Ordered, eager-loading query for a single column"""
+    return _column_base(status).order_by(*[key.order_by() for key in column_keys(status)])
+
+
+def load_column(status, cursor=None, limit=COLUMN_LIMIT):
+    """One Page of a column, starting after cursor"""
+    return keyset_page(_column_base(status), column_keys(status), cursor=cursor, limit=limit)
+
+
+def load_card(request_id):
+    """A single card with everything its template touches, or None"""
+    return _column_base_query().filter(MaintenanceRequest.id == request_id).first()
+
+
+def column_totals():
+    """Card count per status, read from the status index"""
+    return dict(
+        db.session.query(MaintenanceRequest.status, func.count(MaintenanceRequest.id))
+        .group_by(MaintenanceRequest.status)
+        .all()
+    )
+
+
+def load_board(limit=COLUMN_LIMIT):
+    """
+    Load the first `limit` cards of every column plus per-column totals.
+
+    Each column is a bounded range read on (status, created_at), so the
+    cost of a board render doesn't grow with closed history.
+    """
+    totals = column_totals()
+    board = {}
+    for status in STATUSES:
+        page = load_column(status, limit=limit)
+        board[status] = {
+            'cards': page.items,
+            'total': totals.get(status, 0),
+            'has_more': page.has_more,
+            'next_cursor': page.next_cursor,
+        }
+    return board
+
+
+# ---------------- TRANSITIONS ----------------
+def _parse_moves(moves):
+    """{id: (status, version)} from a list of moves; raises ValueError if malformed"""
+    if not isinstance(moves, list) or not moves:
+        raise ValueError('moves must be a non-empty list')
+    if len(moves) > MAX_TRANSITIONS:
+        raise ValueError(f'At most {MAX_TRANSITIONS} moves per batch')
+
+    parsed = {}
+    for move in moves:
+        try:
+            request_id = int(move['id'])
+            version = move.get('version')
+            version = int(version) if version is not None else None
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError('Each move needs a numeric id and version')
+        if move.get('status') not in STATUSES:
+            raise ValueError(f'status must be one of {", ".join(STATUSES)}')
+        if request_id in parsed:
+            raise ValueError(f'Request {request_id} appears twice in the batch')
+        parsed[request_id] = (move['status'], version)
+    return parsed
+
+
+def apply_transitions(moves):
+    """
+    Apply a batch of status moves within the current transaction.
+
+    Each move is {'id', 'status', 'version'}, where version is the
+    version_id the client last saw (None skips the check). Cards changed
+    or deleted since are left alone and reported as conflicts carrying
+    their current state. The caller commits; the versioned UPDATE raises
+    StaleDataError if a card changes between this read and that flush.
+
+    Returns (applied, conflicts).
+    """
+    parsed = _parse_moves(moves)
+    requests = {
+        req.id: req
+        for req in MaintenanceRequest.query
+        .options(selectinload(MaintenanceRequest.equipment))
+        .filter(MaintenanceRequest.id.in_(parsed))
+        .with_for_update()
+    }
+
+    moved, conflicts = [], []
+    open_deltas = {}
+    for request_id, (status, version) in parsed.items():
+        req = requests.get(request_id)
+        if req is None:
+            conflicts.append({'id': request_id, 'reason': 'not_found'})
+            continue
+        if version is not None and req.version_id != version:
+            conflicts.append({
+                'id': request_id, 'reason': 'stale',
+                'status': req.status, 'version': req.version_id,
+            })
+            continue
+        if req.status != status:
+            req.set_status(status, open_deltas)
+        moved.append(req)
+
+    for equipment_id, delta in open_deltas.items():
+        Equipment.adjust_open_requests(equipment_id, delta)
+    db.session.flush()
+
+    applied = [{'id': req.id, 'status': req.status, 'version': req.version_id} for req in moved]
+    return applied, conflicts
@@ -0,0 +1,14 @@
+"""Add Equipment.open_request_count and backfill it"""
+from models import Equipment, MaintenanceRequest, OPEN_STATUSES
+from migrations import add_column
+from sqlalchemy import func, select, update
+
+
+def upgrade(connection):
+    table = Equipment.__table__
+    if add_column(connection, table, table.c.open_request_count):
+        open_count = select(func.count(MaintenanceRequest.id)).where(
+            MaintenanceRequest.equipment_id == Equipment.id,
+            MaintenanceRequest.status.in_(OPEN_STATUSES)
+        ).scalar_subquery()
+        connection.execute(update(table).values(open_request_count=open_count))
@@ -0,0 +1,25 @@
+"""Secondary indexes for the Kanban, calendar, overdue, technician and equipment filter queries"""
+from models import Equipment, MaintenanceRequest
+from migrations import create_index
+
+INDEXES = {
+    MaintenanceRequest: [
+        'ix_request_status_created',
+        'ix_request_status_scheduled',
+        'ix_request_type_scheduled',
+        'ix_request_technician_created',
+        'ix_request_equipment_status',
+    ],
+    Equipment: [
+        'ix_equipment_department',
+        'ix_equipment_assigned_employee',
+        'ix_equipment_is_scrapped',
+    ],
+}
+
+
+def upgrade(connection):
+    for model, names in INDEXES.items():
+        indexes = {index.name: index for index in model.__table__.indexes}
+        for name in names:
+            create_index(connection, indexes[name])
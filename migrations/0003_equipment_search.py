@@ -0,0 +1,6 @@
+"""Full-text search index over equipment name, serial number and location"""
+from search import install_index
+
+
+def upgrade(connection):
+    install_index(connection)
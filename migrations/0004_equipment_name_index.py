@@ -0,0 +1,8 @@
+"""Index backing the equipment list's keyset pages (equipment_name, id)"""
+from models import Equipment
+from migrations import create_index
+
+
+def upgrade(connection):
+    indexes = {index.name: index for index in Equipment.__table__.indexes}
+    create_index(connection, indexes['ix_equipment_name'])
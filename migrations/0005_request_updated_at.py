@@ -0,0 +1,10 @@
+"""Add MaintenanceRequest.updated_at, starting existing rows at created_at"""
+from models import MaintenanceRequest
+from migrations import add_column
+from sqlalchemy import update
+
+
+def upgrade(connection):
+    table = MaintenanceRequest.__table__
+    if add_column(connection, table, table.c.updated_at, default="'1970-01-01 00:00:00'"):
+        connection.execute(update(table).values(updated_at=table.c.created_at))
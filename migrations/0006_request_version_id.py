@@ -0,0 +1,8 @@
+"""Add MaintenanceRequest.version_id for optimistic concurrency on status moves"""
+from models import MaintenanceRequest
+from migrations import add_column
+
+
+def upgrade(connection):
+    table = MaintenanceRequest.__table__
+    add_column(connection, table, table.c.version_id)
@@ -0,0 +1,17 @@
+"""Add Equipment.version_id and the table_version change counters used for ETags"""
+from models import Equipment, TableVersion
+from migrations import add_column
+from etags import TRACKED_TABLES
+from sqlalchemy import insert, select
+
+
+def upgrade(connection):
+    table = Equipment.__table__
+    add_column(connection, table, table.c.version_id)
+
+    versions = TableVersion.__table__
+    versions.create(connection, checkfirst=True)
+    existing = set(connection.execute(select(versions.c.table_name)).scalars())
+    missing = [name for name in TRACKED_TABLES if name not in existing]
+    if missing:
+        connection.execute(insert(versions), [{'table_name': name, 'version': 0} for name in missing])
@@ -0,0 +1,9 @@
+"""Create maintenance_request_archive and the index the archival job selects through"""
+from models import MaintenanceRequest, MaintenanceRequestArchive
+from migrations import create_index
+
+
+def upgrade(connection):
+    MaintenanceRequestArchive.__table__.create(connection, checkfirst=True)
+    indexes = {index.name: index for index in MaintenanceRequest.__table__.indexes}
+    create_index(connection, indexes['ix_request_status_updated'])
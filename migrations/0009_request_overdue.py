@@ -0,0 +1,18 @@
+"""Add MaintenanceRequest.overdue with its indexes, flagging requests already overdue"""
+from datetime import datetime
+from models import MaintenanceRequest, OPEN_STATUSES
+from migrations import add_column, create_index
+from sqlalchemy import update
+
+
+def upgrade(connection):
+    table = MaintenanceRequest.__table__
+    add_column(connection, table, table.c.overdue)
+    indexes = {index.name: index for index in table.indexes}
+    create_index(connection, indexes['ix_request_overdue_scheduled'])
+    create_index(connection, indexes['ix_request_overdue_team'])
+
+    connection.execute(update(table).where(
+        table.c.status.in_(OPEN_STATUSES),
+        table.c.scheduled_date < datetime.utcnow().date(),
+    ).values(overdue=True))
@@ -0,0 +1,11 @@
+"""Create recurrence_rule, plus MaintenanceRequest.recurrence_rule_id and its unique index"""
+from models import MaintenanceRequest, RecurrenceRule
+from migrations import add_column, create_index
+
+
+def upgrade(connection):
+    RecurrenceRule.__table__.create(connection, checkfirst=True)
+    table = MaintenanceRequest.__table__
+    add_column(connection, table, table.c.recurrence_rule_id)
+    indexes = {index.name: index for index in table.indexes}
+    create_index(connection, indexes['uq_request_recurrence'])
@@ -0,0 +1,6 @@
+"""Create status_transition, the request status history"""
+from models import StatusTransition
+
+
+def upgrade(connection):
+    StatusTransition.__table__.create(connection, checkfirst=True)
@@ -0,0 +1,8 @@
+"""Add TableVersion.changed_at, the time behind table-backed Last-Modified headers"""
+from models import TableVersion
+from migrations import add_column
+
+
+def upgrade(connection):
+    table = TableVersion.__table__
+    add_column(connection, table, table.c.changed_at)
@@ -0,0 +1,8 @@
+"""Index archived requests by (request_type, scheduled_date) for calendar ranges"""
+from models import MaintenanceRequestArchive
+from migrations import create_index
+
+
+def upgrade(connection):
+    indexes = {index.name: index for index in MaintenanceRequestArchive.__table__.indexes}
+    create_index(connection, indexes['ix_request_archive_type_scheduled'])
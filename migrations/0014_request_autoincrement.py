@@ -0,0 +1,32 @@
+"""Stop SQLite reusing maintenance_request ids: rebuild the table with AUTOINCREMENT"""
+from models import MaintenanceRequest, MaintenanceRequestArchive
+from sqlalchemy import func, select, text
+
+
+def upgrade(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    table = MaintenanceRequest.__table__
+    ddl = connection.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {'name': table.name}).scalar()
+    if 'AUTOINCREMENT' not in ddl.upper():
+        # SQLite can't alter a key in place: copy into a table built from the model
+        for index in table.indexes:
+            connection.exec_driver_sql(f'DROP INDEX IF EXISTS {index.name}')
+        connection.exec_driver_sql(f'ALTER TABLE {table.name} RENAME TO {table.name}_old')
+        table.create(connection)
+        columns = ', '.join(column.name for column in table.columns)
+        connection.exec_driver_sql(
+            f'INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_old'
+        )
+        connection.exec_driver_sql(f'DROP TABLE {table.name}_old')
+
+    # Start above every id handed out so far, archived ones included
+    top = max(
+        connection.execute(select(func.max(table.c.id))).scalar() or 0,
+        connection.execute(select(func.max(MaintenanceRequestArchive.id))).scalar() or 0,
+    )
+    connection.execute(text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': table.name})
+    connection.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'),
+                       {'name': table.name, 'seq': top})
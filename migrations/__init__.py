@@ -0,0 +1,90 @@
+"""
+GearGuard - Versioned schema migrations
+
+Each module in this package is named NNNN_description.py and defines
+upgrade(connection). Applied versions are recorded in the schema_version
+table, and pending migrations run in order inside one transaction each.
+
+Migrations must be safe to run against a database that db.create_all()
+already built from the current models, so they check before they alter.
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+
+_metadata = MetaData()
+
+schema_version = Table(
+    'schema_version', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def available():
+    """All migrations in this package as (version, name, module), in order"""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        version, _, name = info.name.partition('_')
+        if version.isdigit():
+            module = importlib.import_module(f'{__name__}.{info.name}')
+            migrations.append((int(version), name, module))
+    return sorted(migrations, key=lambda m: m[0])
+
+
+def applied(connection):
+    schema_version.create(connection, checkfirst=True)
+    return set(connection.execute(select(schema_version.c.version)).scalars())
+
+
+def upgrade(engine):
+    """Apply every pending migration, returning the (version, name) pairs run"""
+    with engine.begin() as connection:
+        done = applied(connection)
+
+    ran = []
+    for version, name, module in available():
+        if version in done:
+            continue
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            connection.execute(schema_version.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        ran.append((version, name))
+    return ran
+
+
+# ---------------- HELPERS FOR MIGRATION MODULES ----------------
+def add_column(connection, table, column, default=None):
+    """
+    ALTER TABLE ... ADD COLUMN for a model column, unless it already exists.
+
+    `default` is a SQL literal used to fill existing rows when the column
+    has no server default of its own.
+    """
+    existing = {c['name'] for c in inspect(connection).get_columns(table.name)}
+    if column.name in existing:
+        return False
+
+    dialect = connection.dialect
+    ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect)}'
+    if column.server_default is not None:
+        ddl += f' DEFAULT {column.server_default.arg}'
+    elif default is not None:
+        ddl += f' DEFAULT {default}'
+    if not column.nullable:
+        ddl += ' NOT NULL'
+    connection.exec_driver_sql(ddl)
+    return True
+
+
+def create_index(connection, index):
+    """Create a model-declared index unless it already exists"""
+    existing = {i['name'] for i in inspect(connection).get_indexes(index.table.name)}
+    if index.name in existing:
+        return False
+    index.create(connection)
+    return True
@@ -1,8 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from replicas import RoutingSession
+from changes import touch
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Statuses that count as open work
+OPEN_STATUSES = ['New', 'In Progress']
+
+# table_version entry for Equipment.open_request_count, versioned apart from
+# equipment edits (see etags.py)
+OPEN_REQUEST_COUNTS = 'equipment.open_request_count'
+
+
+def insert_ignoring_duplicates(table, bind=None):
+    """INSERT into table that skips rows clashing with a unique key (default bind: the session's)"""
+    dialect = (bind or db.session.get_bind()).dialect.name
+    prefix = {'sqlite': 'OR IGNORE', 'mysql': 'IGNORE'}.get(dialect)
+    stmt = db.insert(table)
+    return stmt.prefix_with(prefix) if prefix else stmt
 
 class MaintenanceTeam(db.Model):
     __tablename__ = 'maintenance_team'
@@ -29,6 +45,13 @@ class Technician(db.Model):
 
 class Equipment(db.Model):
     __tablename__ = 'equipment'
+    __table_args__ = (
+        # Equipment list: keyset pages ordered by name, plus its filters
+        db.Index('ix_equipment_name', 'equipment_name', 'id'),
+        db.Index('ix_equipment_department', 'department'),
+        db.Index('ix_equipment_assigned_employee', 'assigned_employee'),
+        db.Index('ix_equipment_is_scrapped', 'is_scrapped'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     equipment_name = db.Column(db.String(200), nullable=False)
@@ -41,19 +64,86 @@ class Equipment(db.Model):
     maintenance_team_id = db.Column(db.Integer, db.ForeignKey('maintenance_team.id'), nullable=False)
     default_technician_id = db.Column(db.Integer, db.ForeignKey('technician.id'), nullable=True)
     is_scrapped = db.Column(db.Boolean, default=False, nullable=False)
+    # Denormalized count of open requests, kept in step by the request routes;
+    # changes to it move the OPEN_REQUEST_COUNTS version, not the equipment one
+    open_request_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # Row version; every ORM UPDATE checks and bumps it, and it keys ETags
+    version_id = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+
+    __mapper_args__ = {'version_id_col': version_id}
     
     # Relationships
     requests = db.relationship('MaintenanceRequest', backref='equipment', lazy=True)
     
-    def open_requests_count(self):
-        """Count open requests (New or In Progress)"""
-        return MaintenanceRequest.query.filter(
-            MaintenanceRequest.equipment_id == self.id,
-            MaintenanceRequest.status.in_(['New', 'In Progress'])
-        ).count()
+    @staticmethod
+    def adjust_open_requests(equipment_id, delta):
+        """Atomically shift the open request counter within the current transaction"""
+        if not delta:
+            return
+        # Every request create and status move lands here: recorded as a
+        # counter change, so equipment edits keep their own version
+        db.session.execute(
+            db.update(Equipment)
+            .where(Equipment.id == equipment_id)
+            .values(open_request_count=Equipment.open_request_count + delta)
+            .execution_options(synchronize_session=False, track_changes=False)
+        )
+        touch(db.session, OPEN_REQUEST_COUNTS)
+
+    @staticmethod
+    def adjust_open_requests_bulk(deltas):
+        """Shift many counters, {equipment_id: delta}, in one executemany UPDATE"""
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+        table = Equipment.__table__
+        db.session.execute(
+            db.update(table)
+            .where(table.c.id == db.bindparam('equipment_id'))
+            .values(open_request_count=table.c.open_request_count + db.bindparam('delta')),
+            [{'equipment_id': k, 'delta': v} for k, v in deltas.items()]
+        )
+        touch(db.session, OPEN_REQUEST_COUNTS)
+
+    @staticmethod
+    def recount_open_requests(equipment_ids=None):
+        """Recompute open request counters in a single UPDATE, all or just equipment_ids"""
+        open_count = db.select(db.func.count(MaintenanceRequest.id)).where(
+            MaintenanceRequest.equipment_id == Equipment.id,
+            MaintenanceRequest.status.in_(OPEN_STATUSES)
+        ).scalar_subquery()
+        stmt = db.update(Equipment).values(open_request_count=open_count)
+        if equipment_ids is not None:
+            stmt = stmt.where(Equipment.id.in_(equipment_ids))
+        result = db.session.execute(
+            stmt, execution_options={'synchronize_session': False, 'track_changes': False}
+        )
+        touch(db.session, OPEN_REQUEST_COUNTS)
+        return result.rowcount
 
 class MaintenanceRequest(db.Model):
     __tablename__ = 'maintenance_request'
+    __table_args__ = (
+        # Kanban columns: one status, newest first
+        db.Index('ix_request_status_created', 'status', 'created_at'),
+        # Overdue: open statuses with a scheduled date before today
+        db.Index('ix_request_status_scheduled', 'status', 'scheduled_date'),
+        # Calendar: preventive requests within a month
+        db.Index('ix_request_type_scheduled', 'request_type', 'scheduled_date'),
+        # Technician dashboard
+        db.Index('ix_request_technician_created', 'assigned_technician_id', 'created_at'),
+        # Per-equipment open counts (MySQL indexes FKs itself, SQLite does not)
+        db.Index('ix_request_equipment_status', 'equipment_id', 'status'),
+        # Archival: closed requests last touched before a cutoff
+        db.Index('ix_request_status_updated', 'status', 'updated_at'),
+        # Overdue list (oldest first) and overdue counts per team
+        db.Index('ix_request_overdue_scheduled', 'overdue', 'scheduled_date'),
+        db.Index('ix_request_overdue_team', 'overdue', 'maintenance_team_id'),
+        # One request per rule, asset and date, so rule expansion can safely re-run
+        db.Index('uq_request_recurrence', 'recurrence_rule_id', 'equipment_id', 'scheduled_date', unique=True),
+        # Archived and deleted ids are never handed out again (SQLite reuses the top id otherwise)
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     subject = db.Column(db.String(200), nullable=False)
@@ -67,14 +157,147 @@ class MaintenanceRequest(db.Model):
     priority = db.Column(db.String(10), nullable=False, default='Medium')
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Bumped on every UPDATE, including bulk ones; drives calendar ETags
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Row version for optimistic concurrency; every ORM UPDATE checks and bumps it
+    version_id = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+    # Open with its scheduled date passed; set on write and by the sweeper in overdue.py
+    overdue = db.Column(db.Boolean, default=False, server_default='0', nullable=False)
+    # Set on requests generated from a recurrence rule (see recurrence.py)
+    recurrence_rule_id = db.Column(db.Integer, db.ForeignKey('recurrence_rule.id'), nullable=True)
+
+    __mapper_args__ = {'version_id_col': version_id}
     
     def is_overdue(self):
-        """Check if request is overdue"""
-        if self.scheduled_date and self.status in ['New', 'In Progress']:
-            return self.scheduled_date < datetime.utcnow().date()
-        return False
+        """Check if request is overdue (the stored flag; see overdue.py)"""
+        return bool(self.overdue)
+
+    def is_open(self):
+        return self.status in OPEN_STATUSES
+
+    def set_status(self, new_status, open_deltas=None):
+        """
+        Move to a new status, keeping equipment counters and scrap state in step.
+
+        Batch callers pass an `open_deltas` dict to collect counter changes per
+        equipment id and apply them once, instead of one UPDATE per request.
+        """
+        was_open = self.is_open()
+        now_open = new_status in OPEN_STATUSES
+        if was_open != now_open:
+            delta = 1 if now_open else -1
+            if open_deltas is None:
+                Equipment.adjust_open_requests(self.equipment_id, delta)
+            else:
+                open_deltas[self.equipment_id] = open_deltas.get(self.equipment_id, 0) + delta
+
+        # Scrap logic: mark equipment as scrapped
+        if new_status == 'Scrap':
+            self.equipment.is_scrapped = True
+
+        self.status = new_status
     
 
+class MaintenanceRequestArchive(db.Model):
+    """Closed requests moved out of maintenance_request by archive.py; same ids and columns"""
+    __tablename__ = 'maintenance_request_archive'
+    __table_args__ = (
+        db.Index('ix_request_archive_technician_created', 'assigned_technician_id', 'created_at'),
+        db.Index('ix_request_archive_equipment', 'equipment_id'),
+        db.Index('ix_request_archive_created', 'created_at'),
+        # Calendar ranges cover archived preventive work too
+        db.Index('ix_request_archive_type_scheduled', 'request_type', 'scheduled_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    subject = db.Column(db.String(200), nullable=False)
+    request_type = db.Column(db.String(20), nullable=False)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.id'), nullable=False)
+    maintenance_team_id = db.Column(db.Integer, db.ForeignKey('maintenance_team.id'), nullable=False)
+    assigned_technician_id = db.Column(db.Integer, db.ForeignKey('technician.id'), nullable=True)
+    scheduled_date = db.Column(db.Date, nullable=True)
+    duration_hours = db.Column(db.Float, nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    priority = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    version_id = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Read-only history: no backrefs, so nothing on the live models changes
+    equipment = db.relationship('Equipment', viewonly=True)
+    maintenance_team = db.relationship('MaintenanceTeam', viewonly=True)
+    assigned_technician = db.relationship('Technician', viewonly=True)
+
+    def is_overdue(self):
+        return False
+
+    def is_open(self):
+        return False
+
+
+class RecurrenceRule(db.Model):
+    """
+    A preventive maintenance plan, e.g. every 90 days or every month.
+
+    Applies to one asset (equipment_id), to every asset in a department,
+    or with neither set to the whole fleet; scrapped equipment is skipped.
+    recurrence.py generates its requests up to a rolling horizon and
+    records how far it got in expanded_through.
+    """
+    __tablename__ = 'recurrence_rule'
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(200), nullable=False)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.id'), nullable=True)
+    department = db.Column(db.String(100), nullable=True)
+    interval = db.Column(db.Integer, nullable=False)
+    unit = db.Column(db.String(10), nullable=False, default='days')  # days, months
+    starts_on = db.Column(db.Date, nullable=False)
+    priority = db.Column(db.String(10), nullable=False, default='Medium')
+    active = db.Column(db.Boolean, default=True, nullable=False)
+    expanded_through = db.Column(db.Date, nullable=True)
+
+    # A single asset's rules go with it; without the cascade they would widen to the whole fleet
+    equipment = db.relationship('Equipment', backref=db.backref(
+        'recurrence_rules', lazy=True, cascade='all, delete-orphan'
+    ))
+
+
+class StatusTransition(db.Model):
+    """
+    Append-only history of request status changes, written in batches by
+    status_log.py. No foreign key: rows outlive archived requests, and
+    status_log.py deletes a request's rows with the request.
+    """
+    __tablename__ = 'status_transition'
+    __table_args__ = (
+        # A request's history in order; unique, so a replayed spooled batch is recognised
+        db.Index('uq_transition_request_version', 'request_id', 'version_id', unique=True),
+        # Time-in-state reports over a period
+        db.Index('ix_transition_changed', 'changed_at'),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    request_id = db.Column(db.Integer, nullable=False)
+    # The request's row version after the change
+    version_id = db.Column(db.Integer, nullable=False)
+    from_status = db.Column(db.String(20), nullable=True)
+    to_status = db.Column(db.String(20), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False)
+    changed_by = db.Column(db.Integer, nullable=True)  # user id, when changed from a web request
+
+
+class TableVersion(db.Model):
+    """Change counter per table, bumped by each commit that writes it (see etags.py)"""
+    __tablename__ = 'table_version'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    # When the counter was last bumped, for Last-Modified; NULL until then
+    changed_at = db.Column(db.DateTime, nullable=True)
+
+
 class User(db.Model):
     __tablename__ = 'user'
 
@@ -85,9 +308,3 @@ class User(db.Model):
 
     role = db.Column(db.String(20), nullable=False)  # Admin / Technician
     technician_id = db.Column(db.Integer, db.ForeignKey('technician.id'), nullable=True)
-
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+GearGuard - Overdue tracking
+
+A request is overdue while it is open and its scheduled date has passed.
+Instead of comparing dates on every render, the flag is stored on the
+row: ORM writes set it as they flush, and a sweeper flags requests whose
+scheduled date has gone by since. Each sweep reads only the scheduled
+dates between the previous sweep and today through the (status,
+scheduled_date) index, so a day's sweep touches just the requests that
+fell due that day, and later sweeps the same day run no queries at all.
+
+Each web process sweeps on a daemon thread every OVERDUE_SWEEP_SECONDS,
+started by its first request so it is never inherited across a fork.
+Set OVERDUE_SWEEP_SECONDS=0 and schedule `flask sweep-overdue` instead
+to sweep from cron.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from models import db, MaintenanceRequest, OPEN_STATUSES
+from events import publish_after_commit
+
+log = logging.getLogger(__name__)
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def today():
+    """The current day in UTC; every date-based rule in the app uses this one"""
+    return datetime.utcnow().date()
+
+
+def past_due(status, scheduled_date, on=None):
+    """Whether a request with this status and date is overdue on a day (default today)"""
+    return bool(scheduled_date) and status in OPEN_STATUSES and scheduled_date < (on or today())
+
+
+@event.listens_for(Session, 'before_flush')
+def _flag_on_write(session, flush_context, instances):
+    day = today()
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, MaintenanceRequest):
+            flag = past_due(obj.status, obj.scheduled_date, day)
+            if obj.overdue != flag:
+                obj.overdue = flag
+
+
+# ---------------- SWEEPING ----------------
+# Every scheduled date before this has been swept by this process
+_swept_through = None
+_sweep_lock = threading.Lock()
+
+
+def sweep(batch_size=SWEEP_BATCH_SIZE):
+    """Flag open requests that fell due since the last sweep; returns how many"""
+    global _swept_through
+    with _sweep_lock:
+        day = today()
+        if _swept_through is not None and _swept_through >= day:
+            return 0
+
+        conditions = [
+            MaintenanceRequest.status.in_(OPEN_STATUSES),
+            MaintenanceRequest.scheduled_date < day,
+            MaintenanceRequest.overdue == False,  # noqa: E712
+        ]
+        if _swept_through is not None:
+            conditions.append(MaintenanceRequest.scheduled_date >= _swept_through)
+
+        flagged = 0
+        while True:
+            rows = db.session.execute(
+                select(MaintenanceRequest.id, MaintenanceRequest.status, MaintenanceRequest.version_id)
+                .where(*conditions).limit(batch_size).with_for_update()
+            ).all()
+            if not rows:
+                break
+
+            # Bumping the version lets open boards and cached cards see the change
+            MaintenanceRequest.query.filter(MaintenanceRequest.id.in_([row.id for row in rows])).update({
+                MaintenanceRequest.overdue: True,
+                MaintenanceRequest.version_id: MaintenanceRequest.version_id + 1,
+            }, synchronize_session=False)
+            for row in rows:
+                publish_after_commit(db.session, {
+                    'type': 'card', 'op': 'upsert', 'id': row.id,
+                    'status': row.status, 'version': row.version_id + 1, 'previous': row.status,
+                })
+            db.session.commit()
+            flagged += len(rows)
+
+        _swept_through = day
+        return flagged
+
+
+# ---------------- BACKGROUND SWEEPER ----------------
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+
+def _sweep_forever(app, interval):
+    while True:
+        try:
+            with app.app_context():
+                flagged = sweep()
+            if flagged:
+                log.info('Flagged %d overdue requests', flagged)
+        except Exception:
+            log.exception('Overdue sweep failed')
+        time.sleep(interval)
+
+
+def _ensure_sweeper():
+    global _sweeper_pid
+    if _sweeper_pid == os.getpid():
+        return
+    with _sweeper_lock:
+        if _sweeper_pid == os.getpid():
+            return
+        _sweeper_pid = os.getpid()
+        threading.Thread(
+            target=_sweep_forever,
+            args=(current_app._get_current_object(), current_app.config['OVERDUE_SWEEP_SECONDS']),
+            name='overdue-sweeper', daemon=True
+        ).start()
+
+
+def init_app(app):
+    """Run the sweeper in each process that serves requests, unless disabled"""
+    if app.config.get('OVERDUE_SWEEP_SECONDS'):
+        app.before_request(_ensure_sweeper)
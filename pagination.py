@@ -0,0 +1,139 @@
+"""
+GearGuard - Keyset pagination
+
+Pages are addressed by an opaque cursor holding the sort key of the last
+row shown, so fetching page N is one bounded index range read however
+deep N is, and rows inserted meanwhile never shift or repeat a page.
+Every sort must end in a unique column (normally id), and sort columns
+must be NOT NULL.
+"""
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class SortKey:
+    """One column of a keyset ordering"""
+
+    def __init__(self, expression, descending=False, value=None):
+        self.expression = expression
+        self.descending = descending
+        # Reads this key's value off a result row; defaults to the attribute name
+        self.value = value or (lambda row, key=expression.key: getattr(row, key))
+
+    def order_by(self):
+        return self.expression.desc() if self.descending else self.expression.asc()
+
+    def after(self, value):
+        return self.expression < value if self.descending else self.expression > value
+
+    def at_or_after(self, value):
+        return self.expression <= value if self.descending else self.expression >= value
+
+
+class Page:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise ValueError('Unknown cursor value')
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Decode a cursor into sort key values; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = [_decode_value(v) for v in json.loads(raw)]
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def _after(keys, values):
+    """Rows strictly after `values` in the ordering given by `keys`"""
+    key, value = keys[0], values[0]
+    if len(keys) == 1:
+        return key.after(value)
+    # The leading at_or_after() bound gives the database an index range to scan
+    return and_(
+        key.at_or_after(value),
+        or_(key.after(value), and_(key.expression == value, _after(keys[1:], values[1:])))
+    )
+
+
+def page_size(requested, default=PAGE_SIZE):
+    if not requested:
+        return default
+    return min(max(requested, 1), MAX_PAGE_SIZE)
+
+
+def keyset_page(query, keys, cursor=None, limit=PAGE_SIZE):
+    """
+    Return one Page of `query` ordered by `keys`, starting after `cursor`.
+
+    Raises ValueError for a cursor that doesn't fit this ordering.
+    """
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, len(keys))))
+
+    rows = query.order_by(*[key.order_by() for key in keys]).limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor([key.value(items[-1]) for key in keys])
+    return Page(items, next_cursor)
+
+
+def merged_keyset_page(sources, cursor=None, limit=PAGE_SIZE):
+    """
+    One Page over several (query, keys) sources sharing an ordering, such
+    as a table and its archive. Sort key values must be unique across
+    sources; each source reads at most limit + 1 rows.
+    """
+    rows, more = [], False
+    for query, keys in sources:
+        page = keyset_page(query, keys, cursor=cursor, limit=limit)
+        rows.extend(page.items)
+        more = more or page.has_more
+
+    keys = sources[0][1]
+    # Stable sorts from the last key to the first give the combined ordering
+    for key in reversed(keys):
+        rows.sort(key=key.value, reverse=key.descending)
+
+    items = rows[:limit]
+    next_cursor = None
+    if more or len(rows) > limit:
+        next_cursor = encode_cursor([key.value(items[-1]) for key in keys])
+    return Page(items, next_cursor)
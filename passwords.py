@@ -0,0 +1,132 @@
+"""
+GearGuard - Password hashing pool
+
+Password hashes are deliberately slow. Hashing runs on a small dedicated
+thread pool so a login storm occupies PASSWORD_POOL_SIZE threads rather
+than every request thread. At most PASSWORD_QUEUE_DEPTH further jobs may
+wait; past that, or after PASSWORD_WAIT_SECONDS in the queue, callers get
+PasswordPoolBusy straight away and the route answers 503.
+
+Hashes made with anything other than PASSWORD_HASH_METHOD are upgraded
+transparently the next time their owner logs in.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def _executor(size):
+    try:
+        from gevent import monkey
+    except ImportError:
+        monkey = None
+    if monkey is not None and monkey.is_module_patched('threading'):
+        # Under flask serve, threads are greenlets and a hash would stall the
+        # whole worker; gevent's pool runs it on a real thread instead
+        from gevent.threadpool import ThreadPoolExecutor as RealThreadPoolExecutor
+        return RealThreadPoolExecutor(max_workers=size)
+    return ThreadPoolExecutor(max_workers=size, thread_name_prefix='password-hash')
+
+
+class PasswordPool:
+    """A fixed-size executor that refuses work instead of queueing without bound"""
+
+    def __init__(self, size, queue_depth):
+        self.size = size
+        self.queue_depth = queue_depth
+        self._executor = _executor(size)
+        self._slots = threading.BoundedSemaphore(size + queue_depth)
+        self.rejected = 0
+
+    def run(self, fn, *args, timeout=None):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordPoolBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # Still queued jobs are dropped; one already hashing finishes unobserved
+            future.cancel()
+            self.rejected += 1
+            raise PasswordPoolBusy()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """This process's pool, created on first use so it is never inherited across fork"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = current_app.config
+                size = config.get('PASSWORD_POOL_SIZE') or os.cpu_count() or 1
+                _pool = PasswordPool(size, config.get('PASSWORD_QUEUE_DEPTH', size * 4))
+    return _pool
+
+
+def reset_pool():
+    """Drop the pool, e.g. after changing its settings"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+
+
+def _run(fn, *args):
+    return get_pool().run(fn, *args, timeout=current_app.config.get('PASSWORD_WAIT_SECONDS'))
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    # Werkzeug fills in defaults (e.g. 'pbkdf2' -> 'pbkdf2:sha256:600000')
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    return password_hash.split('$', 1)[0] != _method_prefix(method)
+
+
+def hash_password(password):
+    """Hash with the configured method; raises PasswordPoolBusy when saturated"""
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(user, password):
+    """
+    Check a user's password; raises PasswordPoolBusy when saturated.
+
+    On success an outdated hash is replaced on the user object, which the
+    caller commits. If the pool is too busy for that, the upgrade waits
+    for the next login.
+    """
+    if not _run(check_password_hash, user.password_hash, password):
+        return False
+
+    if needs_rehash(user.password_hash):
+        try:
+            user.password_hash = hash_password(password)
+        except PasswordPoolBusy:
+            pass
+    return True
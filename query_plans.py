@@ -0,0 +1,92 @@
+"""
+GearGuard - Query plan checks
+
+The main query of each hot route, and an EXPLAIN runner that reports any
+plan reading a table without an index. Run with `flask check-query-plans`.
+"""
+from models import db, Equipment, MaintenanceRequest, MaintenanceRequestArchive
+from archive import ARCHIVE_BATCH_SIZE, CLOSED_STATUSES, history_models
+from calendar_buckets import range_statements
+from kanban import STATUSES, COLUMN_LIMIT, column_query
+from pagination import PAGE_SIZE
+from overdue import today as current_day
+from search import search_filter, typeahead_query
+from stats import OVERDUE_LIST_LIMIT, overdue_query
+
+# Dialects whose plans _full_scans can read
+SUPPORTED_DIALECTS = ('sqlite', 'mysql')
+
+
+def route_queries():
+    """(name, statement) for the main query behind each route"""
+    today = current_day()
+    queries = [
+        (f'kanban[{status}]', column_query(status).limit(COLUMN_LIMIT).statement)
+        for status in STATUSES
+    ]
+    # calendar_view and /dashboard/calendar/range: archive, then live
+    queries += [
+        (f'calendar_view[{model.__tablename__}]', statement)
+        for model, statement in zip(history_models, range_statements(today.replace(day=1), today))
+    ]
+    queries += [
+        ('dashboard.overdue', overdue_query().limit(OVERDUE_LIST_LIMIT).statement),
+        ('technician_dashboard', MaintenanceRequest.query.filter_by(
+            assigned_technician_id=1
+        ).order_by(
+            MaintenanceRequest.created_at.desc(), MaintenanceRequest.id.desc()
+        ).limit(PAGE_SIZE).statement),
+        ('technician_dashboard[archive]', MaintenanceRequestArchive.query.filter_by(
+            assigned_technician_id=1
+        ).order_by(
+            MaintenanceRequestArchive.created_at.desc(), MaintenanceRequestArchive.id.desc()
+        ).limit(PAGE_SIZE).statement),
+        ('archive_batch', MaintenanceRequest.query.filter(
+            MaintenanceRequest.status.in_(CLOSED_STATUSES),
+            MaintenanceRequest.updated_at < today
+        ).with_entities(MaintenanceRequest.id).limit(ARCHIVE_BATCH_SIZE).statement),
+        ('list_equipment', Equipment.query.order_by(
+            Equipment.equipment_name, Equipment.id
+        ).limit(PAGE_SIZE).statement),
+        ('list_equipment[department]', Equipment.query.filter(
+            Equipment.department == 'Production'
+        ).statement),
+        ('list_equipment[employee]', Equipment.query.filter(
+            Equipment.assigned_employee == 'Jane Doe'
+        ).statement),
+        ('list_equipment[search]', Equipment.query.filter(
+            search_filter('pump')
+        ).order_by(Equipment.equipment_name, Equipment.id).limit(PAGE_SIZE).statement),
+        # The request form picks equipment through the typeahead
+        ('equipment.search', typeahead_query('pump').statement),
+    ]
+    return queries
+
+
+def _full_scans(connection, sql):
+    """Tables the plan reads in full, per dialect"""
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').all()
+        # "SCAN t" reads every row; "SCAN t USING INDEX" walks an index and
+        # "SCAN t VIRTUAL TABLE INDEX" is a full-text lookup
+        return [
+            row.detail for row in rows
+            if row.detail.startswith('SCAN') and 'USING' not in row.detail and 'VIRTUAL TABLE' not in row.detail
+        ]
+    if connection.dialect.name == 'mysql':
+        rows = connection.exec_driver_sql(f'EXPLAIN {sql}').mappings().all()
+        return [f"{row['table']} (type=ALL)" for row in rows if row['type'] == 'ALL']
+    raise NotImplementedError(f'No plan check for {connection.dialect.name}')
+
+
+def check_query_plans():
+    """Return (name, full_scans) for every route query"""
+    results = []
+    with db.engine.connect() as connection:
+        for name, statement in route_queries():
+            sql = str(statement.compile(
+                dialect=connection.dialect,
+                compile_kwargs={'literal_binds': True}
+            ))
+            results.append((name, _full_scans(connection, sql)))
+    return results
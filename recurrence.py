@@ -0,0 +1,201 @@
+"""
+GearGuard - Preventive maintenance recurrence
+
+Expands RecurrenceRule plans into New, Preventive MaintenanceRequest rows
+up to a rolling horizon (RECURRENCE_HORIZON_DAYS ahead). Each run only
+generates dates after a rule's expanded_through, so extending the
+horizon day by day costs one day of requests, not a regeneration.
+
+Requests are written with executemany INSERT OR IGNORE / INSERT IGNORE
+against the unique (recurrence_rule_id, equipment_id, scheduled_date)
+index, so a re-run, or two runs racing, never duplicates a request.
+Rules are processed in chunks, one transaction each: the inserts, the
+equipment open counters and the rules' new expanded_through commit
+together.
+"""
+from calendar import monthrange
+from datetime import datetime, timedelta
+import overdue
+from sqlalchemy import or_, select, update
+from models import db, insert_ignoring_duplicates, Equipment, MaintenanceRequest, RecurrenceRule
+from changes import touch
+from events import RELOAD, publish_after_commit
+
+UNITS = ['days', 'months']
+
+# Rules per transaction, and request rows per executemany
+RULE_CHUNK = 500
+BATCH_SIZE = 10_000
+
+DEFAULT_HORIZON_DAYS = 90
+
+
+def add_months(day, months):
+    """Same day of the month `months` later, clamped to the month's end"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, monthrange(year, month)[1]))
+
+
+def occurrences(rule, start, end):
+    """Dates of a rule within [start, end]"""
+    step = max(rule.interval, 1)
+    if rule.unit == 'months':
+        # Months from the rule's start to `start`, rounded down to a whole step
+        n = max(0, ((start.year - rule.starts_on.year) * 12 + start.month - rule.starts_on.month) // step)
+        day = add_months(rule.starts_on, n * step)
+        while day < start:
+            n += 1
+            day = add_months(rule.starts_on, n * step)
+        while day <= end:
+            yield day
+            n += 1
+            day = add_months(rule.starts_on, n * step)
+        return
+
+    n = max(0, -(-(start - rule.starts_on).days // step))
+    day = rule.starts_on + timedelta(days=n * step)
+    while day <= end:
+        yield day
+        day += timedelta(days=step)
+
+
+class _Writer:
+    """Buffers generated rows and flushes them in executemany batches"""
+
+    def __init__(self):
+        self.stmt = insert_ignoring_duplicates(MaintenanceRequest.__table__)
+        self.rows = []
+        self.inserted = 0
+        self.deltas = {}
+        # Equipment whose batch hit duplicates; their counters are recounted
+        self.recount = set()
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        result = db.session.execute(self.stmt, self.rows)
+        if result.rowcount == len(self.rows):
+            for row in self.rows:
+                self.deltas[row['equipment_id']] = self.deltas.get(row['equipment_id'], 0) + 1
+            self.inserted += len(self.rows)
+        else:
+            # Some rows already existed and we can't tell which
+            self.recount.update(row['equipment_id'] for row in self.rows)
+            self.inserted += max(result.rowcount, 0)
+        self.rows = []
+
+    def finish(self):
+        self.flush()
+        Equipment.adjust_open_requests_bulk(
+            {k: v for k, v in self.deltas.items() if k not in self.recount}
+        )
+        if self.recount:
+            Equipment.recount_open_requests(self.recount)
+
+
+def _equipment_columns():
+    return select(Equipment.id, Equipment.maintenance_team_id, Equipment.default_technician_id).where(
+        Equipment.is_scrapped == False  # noqa: E712
+    )
+
+
+def _expand_chunk(rules, through, today, writer):
+    now = datetime.utcnow()
+    dates = {}
+    for rule in rules:
+        start = max(rule.starts_on, today)
+        if rule.expanded_through:
+            start = max(start, rule.expanded_through + timedelta(days=1))
+        dates[rule.id] = list(occurrences(rule, start, through))
+
+    def write(rule, equipment_rows):
+        for equipment in equipment_rows:
+            for day in dates[rule.id]:
+                writer.add({
+                    'subject': rule.subject,
+                    'request_type': 'Preventive',
+                    'equipment_id': equipment.id,
+                    'maintenance_team_id': equipment.maintenance_team_id,
+                    'assigned_technician_id': equipment.default_technician_id,
+                    'scheduled_date': day,
+                    'status': 'New',
+                    'priority': rule.priority,
+                    'created_at': now,
+                    'updated_at': now,
+                    'version_id': 1,
+                    'overdue': False,
+                    'recurrence_rule_id': rule.id,
+                })
+
+    # Single-asset rules: all their equipment in one query
+    single = [rule for rule in rules if rule.equipment_id and dates[rule.id]]
+    if single:
+        equipment = {row.id: row for row in db.session.execute(
+            _equipment_columns().where(Equipment.id.in_({rule.equipment_id for rule in single}))
+        )}
+        for rule in single:
+            if rule.equipment_id in equipment:
+                write(rule, [equipment[rule.equipment_id]])
+
+    # Department and fleet-wide rules page through their equipment by id. Each
+    # page is read in full before its inserts: an open server-side cursor
+    # (yield_per on MySQL) would be silently drained by the next statement.
+    for rule in rules:
+        if rule.equipment_id or not dates[rule.id]:
+            continue
+        stmt = _equipment_columns().order_by(Equipment.id).limit(BATCH_SIZE)
+        if rule.department:
+            stmt = stmt.where(Equipment.department == rule.department)
+        last_id = 0
+        while True:
+            page = db.session.execute(stmt.where(Equipment.id > last_id)).all()
+            if not page:
+                break
+            write(rule, page)
+            last_id = page[-1].id
+
+
+def expand_rules(horizon_days=DEFAULT_HORIZON_DAYS, rule_ids=None, today=None):
+    """
+    Generate requests for every active rule not yet expanded to today +
+    horizon_days (or just rule_ids). Returns the number of requests created.
+    """
+    today = today or overdue.today()
+    through = today + timedelta(days=horizon_days)
+    due = RecurrenceRule.query.filter(
+        RecurrenceRule.active == True,  # noqa: E712
+        or_(RecurrenceRule.expanded_through.is_(None), RecurrenceRule.expanded_through < through)
+    )
+    if rule_ids is not None:
+        due = due.filter(RecurrenceRule.id.in_(rule_ids))
+
+    created = 0
+    last_id = 0
+    while True:
+        rules = due.filter(RecurrenceRule.id > last_id).order_by(RecurrenceRule.id).limit(RULE_CHUNK).all()
+        if not rules:
+            break
+        last_id = rules[-1].id
+
+        writer = _Writer()
+        _expand_chunk(rules, through, today, writer)
+        writer.finish()
+        db.session.execute(
+            update(RecurrenceRule.__table__)
+            .where(RecurrenceRule.__table__.c.id.in_([rule.id for rule in rules]))
+            .values(expanded_through=through)
+        )
+        # Equipment only had its open request counters moved, which they record themselves
+        touch(db.session, MaintenanceRequest.__tablename__, RecurrenceRule.__tablename__)
+        if writer.inserted:
+            # Bulk inserts bypass the per-card feed; open boards reload instead
+            publish_after_commit(db.session, RELOAD)
+        db.session.commit()
+        created += writer.inserted
+    return created
@@ -0,0 +1,72 @@
+"""
+GearGuard - Reference data cache
+
+Teams, technicians per team and the equipment list's department and
+employee filter options change rarely but are read by nearly every form.
+They are cached per process as plain tuples and dicts (never ORM objects,
+which would outlive their session), loaded from the primary so a lagging
+replica can't refill the cache with data a write just replaced.
+
+The routes that write teams, technicians or equipment call invalidate()
+after committing; the TTL bounds how stale other worker processes can be.
+"""
+from collections import namedtuple
+from cache import TTLCache
+from models import db, Equipment, MaintenanceTeam, Technician
+from replicas import use_primary
+
+TeamOption = namedtuple('TeamOption', ['id', 'team_name'])
+
+# Entries: teams, departments, employees and one technician list per team
+_refdata_cache = TTLCache(maxsize=256, ttl=300)
+
+
+@use_primary
+def _load_teams():
+    return [
+        TeamOption(*row)
+        for row in db.session.query(MaintenanceTeam.id, MaintenanceTeam.team_name)
+        .order_by(MaintenanceTeam.id)
+    ]
+
+
+@use_primary
+def _load_technicians(team_id):
+    return [
+        {'id': technician_id, 'name': name}
+        for technician_id, name in db.session.query(Technician.id, Technician.name)
+        .filter(Technician.team_id == team_id)
+        .order_by(Technician.id)
+    ]
+
+
+@use_primary
+def _load_distinct(column):
+    return [value for (value,) in db.session.query(column).distinct().filter(column.isnot(None))]
+
+
+def teams():
+    """Every team as (id, team_name), for select boxes"""
+    return _refdata_cache.get_or_set('teams', _load_teams)
+
+
+def technicians(team_id):
+    """A team's technicians as {'id', 'name'} dicts"""
+    return _refdata_cache.get_or_set(('technicians', team_id), lambda: _load_technicians(team_id))
+
+
+def departments():
+    return _refdata_cache.get_or_set('departments', lambda: _load_distinct(Equipment.department))
+
+
+def employees():
+    return _refdata_cache.get_or_set('employees', lambda: _load_distinct(Equipment.assigned_employee))
+
+
+def invalidate():
+    """Drop everything; call after committing a team, technician or equipment write"""
+    _refdata_cache.invalidate()
+
+
+def cache_stats():
+    return _refdata_cache.stats()
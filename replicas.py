@@ -0,0 +1,98 @@
+"""
+GearGuard - Read replica routing
+
+Views marked @read_only send their SELECTs to one of the replicas listed
+in SQLALCHEMY_REPLICA_URIS. Writes, SELECT ... FOR UPDATE and every
+other view stay on the primary.
+
+Replicas lag behind, so users read their own writes from the primary:
+after a commit that changed anything, that user's reads stick to the
+primary for REPLICA_STICKY_SECONDS, and a read-only view that writes
+anyway stays on the primary for the rest of the request.
+"""
+import random
+import time
+from functools import wraps
+from flask import current_app, has_request_context, request, session as user_session
+from flask_sqlalchemy.session import Session
+from changes import on_commit
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+def replica_binds(uris):
+    """SQLALCHEMY_BINDS entries for a list of replica URLs"""
+    return {f'{REPLICA_BIND_PREFIX}{i}': uri for i, uri in enumerate(uris)}
+
+
+def _is_plain_select(clause):
+    return getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that can route reads to a replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_only') and not self.info.get('wrote'):
+            if self._flushing or not _is_plain_select(clause):
+                # From the first write on, this request reads from the primary too
+                self.info['wrote'] = True
+            else:
+                replica = self._replica()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica(self):
+        # One replica per request, so a page never mixes two replicas' lag
+        if 'replica' not in self.info:
+            keys = [
+                key for key in self._db.engines
+                if key and key.startswith(REPLICA_BIND_PREFIX)
+            ]
+            self.info['replica'] = self._db.engines[random.choice(keys)] if keys else None
+        return self.info['replica']
+
+
+def _sticky():
+    return user_session.get('primary_until', 0) > time.time()
+
+
+def read_only(view):
+    """Serve a GET view's reads from a replica unless the user just wrote"""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        db_session = current_app.extensions['sqlalchemy'].session
+        if request.method in ('GET', 'HEAD') and not _sticky():
+            db_session.info['read_only'] = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            for key in ('read_only', 'wrote', 'replica'):
+                db_session.info.pop(key, None)
+    return wrapped
+
+
+def use_primary(fn):
+    """
+    Run fn's reads on the primary even inside a read-only view.
+
+    For loaders that fill per-process caches: a replica that lags could
+    otherwise put pre-write data back right after a write invalidated it.
+    """
+    @wraps(fn)
+    def wrapped(*args, **kwargs):
+        info = current_app.extensions['sqlalchemy'].session.info
+        routed = info.pop('read_only', None)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if routed:
+                info['read_only'] = routed
+    return wrapped
+
+
+@on_commit()
+def _stick_to_primary(changed_tables):
+    if has_request_context() and current_app.config.get('SQLALCHEMY_REPLICA_URIS'):
+        user_session['primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
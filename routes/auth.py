@@ -1,9 +1,17 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models import db, User
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import PasswordPoolBusy, hash_password, verify_password
 
 auth = Blueprint('auth', __name__)
 
+# Seconds a client is asked to wait when the hashing pool is saturated
+BUSY_RETRY_AFTER = 3
+
+
+def busy_response(template):
+    flash('Too many sign-ins right now, please try again in a few seconds.', 'error')
+    return render_template(template), 503, {'Retry-After': str(BUSY_RETRY_AFTER)}
+
 # ---------------- LOGIN ----------------
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
@@ -16,7 +24,15 @@ def login():
 
         user = User.query.filter_by(email=email).first()
 
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and verify_password(user, password)
+        except PasswordPoolBusy:
+            return busy_response('auth/login.html')
+
+        if valid:
+            # Saves a hash upgraded to the current method, if any
+            db.session.commit()
+
             session['user_id'] = user.id
             session['role'] = user.role
             session['technician_id'] = user.technician_id
@@ -45,12 +61,17 @@ def signup():
             flash('Email already exists', 'error')
             return redirect(url_for('auth.signup'))
 
+        try:
+            password_hash = hash_password(password)
+        except PasswordPoolBusy:
+            return busy_response('auth/signup.html')
+
         user = User(
             name=name,
             email=email,
-            role=role
+            role=role,
+            password_hash=password_hash
         )
-        user.set_password(password)
 
         db.session.add(user)
         db.session.commit()
@@ -1,11 +1,23 @@
 """
 GearGuard - Dashboard Routes
 """
-from flask import Blueprint, render_template, request, session, redirect, url_for
-from models import MaintenanceRequest, Equipment
-from datetime import datetime
+from flask import Blueprint, Response, render_template, request, session, redirect, url_for, jsonify, abort
+from sqlalchemy.orm import joinedload
+from werkzeug.http import is_resource_modified
+from archive import history_models
+from kanban import STATUSES, COLUMN_LIMIT, load_board, load_card, load_column
+from events import CLOSED, get_broker
+from replicas import read_only
+from pagination import PAGE_SIZE, SortKey, merged_keyset_page, page_size
+from calendar_buckets import MAX_RANGE_DAYS, range_buckets, range_validators
+from overdue import today
+from stats import dashboard_stats, overdue_requests, cache_stats as stats_cache_stats
+import refdata
+from fragments import render_card, cache_stats as card_cache_stats
+from datetime import date, datetime
 from calendar import monthrange
 from functools import wraps
+import json
 
 bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
@@ -31,45 +43,110 @@ def login_required(view_func=None, role=None):
 
 @bp.route('/kanban')
 @login_required(role='Admin')
+@read_only
 def kanban():
     """Kanban board view - primary screen"""
-    # Get all requests organized by status
-    PRIORITY_ORDER = {
-    'High': 1,
-    'Medium': 2,
-    'Low': 3
-    }
-
-    new_requests = MaintenanceRequest.query.filter_by(status='New').all()
-    new_requests.sort(key=lambda r: PRIORITY_ORDER.get(getattr(r, 'priority', 'Medium'), 2))
-    
-    in_progress_requests = MaintenanceRequest.query.filter_by(status='In Progress').order_by(
-        MaintenanceRequest.created_at.desc()
-    ).all()
-    
-    repaired_requests = MaintenanceRequest.query.filter_by(status='Repaired').order_by(
-        MaintenanceRequest.created_at.desc()
-    ).all()
-    
-    scrap_requests = MaintenanceRequest.query.filter_by(status='Scrap').order_by(
-        MaintenanceRequest.created_at.desc()
-    ).all()
-    
+    # One totals query plus one keyset read of the first page per column
+    board = load_board()
+
     return render_template(
         'kanban.html',
-        new_requests=new_requests,
-        in_progress_requests=in_progress_requests,
-        repaired_requests=repaired_requests,
-        scrap_requests=scrap_requests
+        statuses=STATUSES,
+        board=board,
+        render_card=render_card
     )
 
 
+@bp.route('/kanban/column')
+@login_required(role='Admin')
+@read_only
+def kanban_column():
+    """Load more cards for a single Kanban column"""
+    status = request.args.get('status', '')
+    if status not in STATUSES:
+        return jsonify({'success': False, 'message': 'Unknown status'}), 400
+
+    limit = page_size(request.args.get('limit', type=int), default=COLUMN_LIMIT)
+
+    try:
+        page = load_column(status, cursor=request.args.get('cursor'), limit=limit)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+
+    html = ''.join(render_card(req) for req in page.items)
+
+    return jsonify({
+        'success': True,
+        'html': html,
+        'has_more': page.has_more,
+        'next_url': url_for('dashboard.kanban_column', status=status, cursor=page.next_cursor) if page.has_more else None
+    })
+
+
+@bp.route('/kanban/card/<int:id>')
+@login_required(role='Admin')
+def kanban_card(id):
+    """One freshly rendered card, for patching a live board"""
+    req = load_card(id)
+    if not req:
+        return jsonify({'success': False, 'message': 'Request not found'}), 404
+
+    return jsonify({
+        'success': True,
+        'html': render_card(req),
+        'status': req.status,
+        'version': req.version_id
+    })
+
+
+# Comment line sent on idle streams so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 20
+
+
+@bp.route('/kanban/events')
+@login_required(role='Admin')
+def kanban_events():
+    """
+    Server-Sent Events feed of card and equipment changes.
+
+    The stream holds no database connection; an idle board costs one
+    open socket instead of a full board render per refresh.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription = get_broker().subscribe(last_event_id)
+
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                item = subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if item is CLOSED:
+                    # This worker is stopping: reconnect, to another one, straight away
+                    yield 'retry: 500\n\n'
+                    return
+                if item is None:
+                    yield ': keepalive\n\n'
+                    continue
+                event_id, event = item
+                lines = f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'
+                yield f'id: {event_id}\n{lines}' if event_id else lines
+        finally:
+            subscription.close()
+
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @bp.route('/calendar')
+@read_only
 def calendar_view():
     """Calendar view for preventive maintenance"""
     # Get current month and year from query params or use current date
-    year = int(request.args.get('year', datetime.now().year))
-    month = int(request.args.get('month', datetime.now().month))
+    year = int(request.args.get('year', today().year))
+    month = int(request.args.get('month', today().month))
     
     # Calculate previous and next month
     if month == 1:
@@ -87,20 +164,9 @@ def calendar_view():
     last_day_num = monthrange(year, month)[1]
     last_day = datetime(year, month, last_day_num)
     
-    # Get all preventive maintenance requests for this month
-    preventive_requests = MaintenanceRequest.query.filter(
-        MaintenanceRequest.request_type == 'Preventive',
-        MaintenanceRequest.scheduled_date >= first_day.date(),
-        MaintenanceRequest.scheduled_date <= last_day.date()
-    ).all()
-    
-    # Organize requests by date
-    requests_by_date = {}
-    for req in preventive_requests:
-        date_key = req.scheduled_date.day
-        if date_key not in requests_by_date:
-            requests_by_date[date_key] = []
-        requests_by_date[date_key].append(req)
+    # Preventive requests for this month, already bucketed by date
+    buckets = range_buckets(first_day.date(), last_day.date())
+    requests_by_date = {date.fromisoformat(day).day: items for day, items in buckets.items()}
     
     # Build calendar grid
     calendar_grid = []
@@ -139,35 +205,53 @@ def calendar_view():
     )
 
 
+@bp.route('/calendar/range')
+@read_only
+def calendar_range():
+    """Preventive requests per day for a date range, with conditional GET support"""
+    try:
+        start = date.fromisoformat(request.args.get('start', ''))
+        end = date.fromisoformat(request.args.get('end', ''))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'start and end must be YYYY-MM-DD'}), 400
+
+    if end < start or (end - start).days > MAX_RANGE_DAYS:
+        return jsonify({'success': False, 'message': f'Range must span 0-{MAX_RANGE_DAYS} days'}), 400
+
+    # Answer revalidations from the cheap aggregate, before loading any rows
+    etag, last_modified = range_validators(start, end)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    else:
+        response = jsonify({
+            'success': True,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'days': range_buckets(start, end)
+        })
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Browsers keep the body but must revalidate before reusing it
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
 @bp.route('/')
 @login_required(role='Admin')
+@read_only
 def dashboard():
     """Main dashboard with statistics"""
-    total_equipment = Equipment.query.count()
-    scrapped_equipment = Equipment.query.filter_by(is_scrapped=True).count()
-    active_equipment = total_equipment - scrapped_equipment
-    
-    total_requests = MaintenanceRequest.query.count()
-    new_requests = MaintenanceRequest.query.filter_by(status='New').count()
-    in_progress_requests = MaintenanceRequest.query.filter_by(status='In Progress').count()
-    repaired_requests = MaintenanceRequest.query.filter_by(status='Repaired').count()
-    
-    # Overdue requests
-    overdue_requests = MaintenanceRequest.query.filter(
-        MaintenanceRequest.scheduled_date < datetime.now().date(),
-        MaintenanceRequest.status.in_(['New', 'In Progress'])
-    ).all()
-    
+    stats = dashboard_stats()
+
+    # Only the oldest few overdue requests are listed; the total comes from stats
+    overdue_list = overdue_requests()
+
     return render_template(
         'dashboard.html',
-        total_equipment=total_equipment,
-        active_equipment=active_equipment,
-        scrapped_equipment=scrapped_equipment,
-        total_requests=total_requests,
-        new_requests=new_requests,
-        in_progress_requests=in_progress_requests,
-        repaired_requests=repaired_requests,
-        overdue_requests=overdue_requests
+        overdue_list=overdue_list,
+        **stats
     )
 
 
@@ -179,12 +263,66 @@ def technician_dashboard():
 
     technician_id = session.get('technician_id')
 
-
-    assigned_requests = MaintenanceRequest.query.filter_by(
-    assigned_technician_id=technician_id).all()
-
+    try:
+        page = technician_requests(technician_id, cursor=request.args.get('cursor'))
+    except ValueError:
+        abort(400)
 
     return render_template(
         'technician_dashboard.html',
-        assigned_requests=assigned_requests
+        assigned_requests=page.items,
+        next_cursor=page.next_cursor
     )
+
+
+@bp.route('/technician/api/requests')
+@login_required()
+def technician_requests_api():
+    """JSON pages of the signed-in technician's requests"""
+    if session.get('role') != 'Technician':
+        return jsonify({'success': False, 'message': 'Technicians only'}), 403
+
+    try:
+        page = technician_requests(
+            session.get('technician_id'),
+            cursor=request.args.get('cursor'),
+            limit=page_size(request.args.get('limit', type=int))
+        )
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+
+    return jsonify({
+        'success': True,
+        'requests': [{
+            'id': req.id,
+            'subject': req.subject,
+            'equipment_name': req.equipment.equipment_name,
+            'status': req.status,
+            'scheduled_date': req.scheduled_date.isoformat() if req.scheduled_date else None,
+        } for req in page.items],
+        'next_cursor': page.next_cursor
+    })
+
+
+def technician_requests(technician_id, cursor=None, limit=PAGE_SIZE):
+    """One page of a technician's requests, newest first, archived ones included"""
+    return merged_keyset_page([
+        (model.query.options(
+            joinedload(model.equipment)
+        ).filter_by(assigned_technician_id=technician_id), [
+            SortKey(model.created_at, descending=True),
+            SortKey(model.id, descending=True),
+        ])
+        for model in history_models
+    ], cursor=cursor, limit=limit)
+
+
+@bp.route('/api/cache-stats')
+@login_required(role='Admin')
+def cache_stats():
+    """Hit/miss counters of this worker's in-process caches"""
+    return jsonify({
+        'refdata': refdata.cache_stats(),
+        'dashboard_stats': stats_cache_stats(),
+        'kanban_cards': card_cache_stats(),
+    })
@@ -1,17 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from models import db, Equipment, MaintenanceTeam, Technician
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from models import db, Equipment, OPEN_REQUEST_COUNTS
+from pagination import SortKey, keyset_page, page_size
+from search import TYPEAHEAD_LIMIT, search_filter, typeahead
+from importer import import_equipment
+from exporter import equipment_export_query, export_response
+from replicas import read_only
+import refdata
+from etags import conditional, make_etag, not_modified, set_validators
 from datetime import datetime
 
 bp = Blueprint('equipment', __name__, url_prefix='/equipment')
 
-@bp.route('/')
-def list_equipment():
-    """List all equipment with filters"""
-    department_filter = request.args.get('department', '')
-    employee_filter = request.args.get('employee', '')
-    search_query = request.args.get('search', '')
-    
-    query = Equipment.query
+EQUIPMENT_ORDER = [SortKey(Equipment.equipment_name), SortKey(Equipment.id)]
+
+
+def filtered_equipment(department_filter='', employee_filter='', search_query=''):
+    """Equipment query with the list page's filters applied"""
+    # Team names are rendered per row, so load them with the equipment
+    query = Equipment.query.options(db.joinedload(Equipment.maintenance_team))
     
     if department_filter:
         query = query.filter(Equipment.department == department_filter)
@@ -20,24 +26,35 @@ def list_equipment():
         query = query.filter(Equipment.assigned_employee == employee_filter)
     
     if search_query:
-        query = query.filter(
-            db.or_(
-                Equipment.equipment_name.like(f'%{search_query}%'),
-                Equipment.serial_number.like(f'%{search_query}%')
-            )
-        )
+        query = query.filter(search_filter(search_query))
+
+    return query
+
+
+@bp.route('/')
+@read_only
+@conditional('equipment', 'maintenance_team', OPEN_REQUEST_COUNTS)
+def list_equipment():
+    """List all equipment with filters"""
+    department_filter = request.args.get('department', '')
+    employee_filter = request.args.get('employee', '')
+    search_query = request.args.get('search', '')
     
-    equipment_list = query.all()
+    query = filtered_equipment(department_filter, employee_filter, search_query)
+
+    try:
+        page = keyset_page(query, EQUIPMENT_ORDER, cursor=request.args.get('cursor'))
+    except ValueError:
+        abort(400)
     
     # Get unique departments and employees for filters
-    departments = db.session.query(Equipment.department).distinct().filter(Equipment.department.isnot(None)).all()
-    departments = [d[0] for d in departments]
-    
-    employees = db.session.query(Equipment.assigned_employee).distinct().filter(Equipment.assigned_employee.isnot(None)).all()
-    employees = [e[0] for e in employees]
+    departments = refdata.departments()
+    employees = refdata.employees()
     
     return render_template('equipment.html', 
-                         equipment_list=equipment_list,
+                         equipment_list=page.items,
+                         next_cursor=page.next_cursor,
+                         is_first_page=not request.args.get('cursor'),
                          departments=departments,
                          employees=employees,
                          current_department=department_filter,
@@ -64,6 +81,7 @@ def create():
             
             db.session.add(equipment)
             db.session.commit()
+            refdata.invalidate()
             
             flash('Equipment created successfully!', 'success')
             return redirect(url_for('equipment.list_equipment'))
@@ -72,9 +90,26 @@ def create():
             db.session.rollback()
             flash(f'Error creating equipment: {str(e)}', 'error')
     
-    teams = MaintenanceTeam.query.all()
+    teams = refdata.teams()
     return render_template('equipment_form.html', teams=teams, equipment=None)
 
+@bp.route('/import', methods=['POST'])
+def import_csv():
+    """Bulk import equipment from an uploaded CSV; returns a per-row report"""
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'success': False, 'message': 'Upload a CSV file as "file"'}), 400
+
+    report = import_equipment(upload.stream, dry_run=request.form.get('dry_run') == '1')
+    if report.inserted:
+        refdata.invalidate()
+    return jsonify({'success': report.error_count == 0, **report.to_dict()})
+
+@bp.route('/export')
+def export():
+    """Stream equipment as CSV or NDJSON (?format=, department, team_id, scrapped)"""
+    return export_response(equipment_export_query, 'equipment')
+
 @bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 def edit(id):
     """Edit equipment"""
@@ -93,6 +128,7 @@ def edit(id):
             equipment.default_technician_id = int(request.form['default_technician_id']) if request.form.get('default_technician_id') else None
             
             db.session.commit()
+            refdata.invalidate()
             
             flash('Equipment updated successfully!', 'success')
             return redirect(url_for('equipment.list_equipment'))
@@ -101,7 +137,7 @@ def edit(id):
             db.session.rollback()
             flash(f'Error updating equipment: {str(e)}', 'error')
     
-    teams = MaintenanceTeam.query.all()
+    teams = refdata.teams()
     return render_template('equipment_form.html', teams=teams, equipment=equipment)
 
 @bp.route('/delete/<int:id>', methods=['POST'])
@@ -112,6 +148,7 @@ def delete(id):
     try:
         db.session.delete(equipment)
         db.session.commit()
+        refdata.invalidate()
         flash('Equipment deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -120,17 +157,75 @@ def delete(id):
     return redirect(url_for('equipment.list_equipment'))
 
 @bp.route('/api/technicians/<int:team_id>')
+@conditional('technician')
 def get_technicians(team_id):
     """API endpoint to get technicians for a team"""
-    technicians = Technician.query.filter_by(team_id=team_id).all()
-    return jsonify([{'id': t.id, 'name': t.name} for t in technicians])
+    return jsonify(refdata.technicians(team_id))
 
 @bp.route('/api/details/<int:equipment_id>')
 def get_equipment_details(equipment_id):
     """API endpoint to get equipment details for auto-fill"""
-    equipment = Equipment.query.get_or_404(equipment_id)
+    row = db.session.execute(
+        db.select(
+            Equipment.maintenance_team_id, Equipment.default_technician_id, Equipment.is_scrapped
+        ).where(Equipment.id == equipment_id)
+    ).first()
+    if row is None:
+        abort(404)
+
+    # Built from the fields returned, so writes that skip the row version still show
+    etag = make_etag('equipment', equipment_id, *row)
+    if etag in request.if_none_match:
+        return not_modified(etag)
+
+    response = jsonify({
+        'maintenance_team_id': row.maintenance_team_id,
+        'default_technician_id': row.default_technician_id,
+        'is_scrapped': row.is_scrapped
+    })
+    return set_validators(response, etag)
+
+@bp.route('/api/search')
+def search_equipment():
+    """API endpoint for the equipment typeahead in the request form"""
+    return jsonify(typeahead(
+        request.args.get('q', ''),
+        limit=request.args.get('limit', TYPEAHEAD_LIMIT, type=int),
+        include_scrapped=request.args.get('include_scrapped') == '1'
+    ))
+
+@bp.route('/api/list')
+@read_only
+@conditional('equipment', 'maintenance_team', OPEN_REQUEST_COUNTS)
+def list_equipment_api():
+    """JSON pages of the equipment list, with the same filters as the list page"""
+    query = filtered_equipment(
+        request.args.get('department', ''),
+        request.args.get('employee', ''),
+        request.args.get('search', '')
+    )
+
+    try:
+        page = keyset_page(
+            query, EQUIPMENT_ORDER,
+            cursor=request.args.get('cursor'),
+            limit=page_size(request.args.get('limit', type=int))
+        )
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+
     return jsonify({
-        'maintenance_team_id': equipment.maintenance_team_id,
-        'default_technician_id': equipment.default_technician_id,
-        'is_scrapped': equipment.is_scrapped
-    })
\ No newline at end of file
+        'success': True,
+        'equipment': [{
+            'id': e.id,
+            'equipment_name': e.equipment_name,
+            'serial_number': e.serial_number,
+            'department': e.department,
+            'assigned_employee': e.assigned_employee,
+            'location': e.location,
+            'team_name': e.maintenance_team.team_name,
+            'is_scrapped': e.is_scrapped,
+            'open_request_count': e.open_request_count,
+        } for e in page.items],
+        'next_cursor': page.next_cursor
+    })
@@ -1,5 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from models import db, MaintenanceRequest, Equipment, MaintenanceTeam, Technician
+from models import db, MaintenanceRequest, Equipment
+from importer import import_requests
+from exporter import export_response, request_export_query
+from kanban import apply_transitions
+from assignment import assign
+import refdata
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
 
 bp = Blueprint('requests', __name__, url_prefix='/requests')
@@ -11,6 +17,9 @@ def create():
         try:
             equipment_id = int(request.form['equipment_id'])
             equipment = Equipment.query.get(equipment_id)
+            if not equipment:
+                flash('Please pick the equipment from the search results.', 'error')
+                return redirect(url_for('requests.create'))
             
             # Block requests for scrapped equipment
             if equipment.is_scrapped:
@@ -28,8 +37,12 @@ def create():
                 priority=request.form.get('priority', 'Medium'),
                 status='New'
             )
+            # Left blank: the least-loaded technician of the team takes it
+            if maintenance_request.assigned_technician_id is None:
+                assign(maintenance_request)
             
             db.session.add(maintenance_request)
+            Equipment.adjust_open_requests(equipment_id, 1)
             db.session.commit()
             
             flash('Maintenance request created successfully!', 'success')
@@ -39,18 +52,32 @@ def create():
             db.session.rollback()
             flash(f'Error creating request: {str(e)}', 'error')
     
-    equipment_list = Equipment.query.filter_by(is_scrapped=False).all()
-    teams = MaintenanceTeam.query.all()
+    # Equipment is picked through the /equipment/api/search typeahead
+    teams = refdata.teams()
     
     # Pre-fill from query params (for calendar)
     scheduled_date = request.args.get('date', '')
     
     return render_template('request_form.html', 
-                         equipment_list=equipment_list, 
                          teams=teams,
                          request_obj=None,
                          scheduled_date=scheduled_date)
 
+@bp.route('/import', methods=['POST'])
+def import_csv():
+    """Bulk import maintenance requests from an uploaded CSV; returns a per-row report"""
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'success': False, 'message': 'Upload a CSV file as "file"'}), 400
+
+    report = import_requests(upload.stream, dry_run=request.form.get('dry_run') == '1')
+    return jsonify({'success': report.error_count == 0, **report.to_dict()})
+
+@bp.route('/export')
+def export():
+    """Stream request history as CSV or NDJSON (?format=, status, start, end, team_id, department)"""
+    return export_response(request_export_query, 'maintenance_requests')
+
 @bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 def edit(id):
     """Edit maintenance request"""
@@ -58,9 +85,14 @@ def edit(id):
     
     if request.method == 'POST':
         try:
+            equipment_id = int(request.form['equipment_id'])
+            if maintenance_request.is_open() and equipment_id != maintenance_request.equipment_id:
+                Equipment.adjust_open_requests(maintenance_request.equipment_id, -1)
+                Equipment.adjust_open_requests(equipment_id, 1)
+
             maintenance_request.subject = request.form['subject']
             maintenance_request.request_type = request.form['request_type']
-            maintenance_request.equipment_id = int(request.form['equipment_id'])
+            maintenance_request.equipment_id = equipment_id
             maintenance_request.maintenance_team_id = int(request.form['maintenance_team_id'])
             maintenance_request.assigned_technician_id = int(request.form['assigned_technician_id']) if request.form.get('assigned_technician_id') else None
             maintenance_request.scheduled_date = datetime.strptime(request.form['scheduled_date'], '%Y-%m-%d').date() if request.form.get('scheduled_date') else None
@@ -76,11 +108,9 @@ def edit(id):
             db.session.rollback()
             flash(f'Error updating request: {str(e)}', 'error')
     
-    equipment_list = Equipment.query.all()
-    teams = MaintenanceTeam.query.all()
+    teams = refdata.teams()
     
     return render_template('request_form.html', 
-                         equipment_list=equipment_list, 
                          teams=teams,
                          request_obj=maintenance_request,
                          scheduled_date='')
@@ -91,6 +121,8 @@ def delete_request(id):
     maintenance_request = MaintenanceRequest.query.get_or_404(id)
     
     try:
+        if maintenance_request.is_open():
+            Equipment.adjust_open_requests(maintenance_request.equipment_id, -1)
         db.session.delete(maintenance_request)
         db.session.commit()
         flash('Request deleted successfully!', 'success')
@@ -102,36 +134,67 @@ def delete_request(id):
 
 @bp.route('/update_status', methods=['POST'])
 def update_status():
-    """Update request status (for Kanban drag & drop)"""
-    data = request.get_json()
-    request_id = data.get('request_id')
-    new_status = data.get('status')
-    
+    """Update one request's status; send `version` to guard against concurrent edits"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Expected a JSON object'}), 400
+    # apply_transitions rejects a missing or non-numeric id and unknown statuses with ValueError
+    move = {'id': data.get('request_id'), 'status': data.get('status'), 'version': data.get('version')}
+
     try:
-        maintenance_request = MaintenanceRequest.query.get(request_id)
-        if not maintenance_request:
+        # Keeps the equipment's open counter and scrap flag in the same transaction
+        applied, conflicts = apply_transitions([move])
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Request was changed by someone else'}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+    if conflicts:
+        conflict = conflicts[0]
+        if conflict['reason'] == 'not_found':
             return jsonify({'success': False, 'message': 'Request not found'}), 404
-        
-        # Scrap logic: mark equipment as scrapped
-        if new_status == 'Scrap':
-            equipment = Equipment.query.get(maintenance_request.equipment_id)
-            equipment.is_scrapped = True
-        
-        maintenance_request.status = new_status
+        return jsonify({'success': False, 'message': 'Request was changed by someone else', **conflict}), 409
+    return jsonify({'success': True, **applied[0]})
+
+@bp.route('/transitions', methods=['POST'])
+def transitions():
+    """
+    Apply many Kanban moves in one transaction.
+
+    Body: {"moves": [{"id", "status", "version"}, ...]}. Moves on cards
+    that changed since the client loaded them come back in `conflicts`.
+    """
+    data = request.get_json(silent=True) or {}
+
+    try:
+        applied, conflicts = apply_transitions(data.get('moves'))
         db.session.commit()
-        
-        return jsonify({'success': True})
-    
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Cards changed while saving; reload and try again'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 500
 
+    return jsonify({'success': True, 'applied': applied, 'conflicts': conflicts})
+
 @bp.route('/delete/<int:id>', methods=['POST'])
 def delete(id):
     """Delete maintenance request"""
     maintenance_request = MaintenanceRequest.query.get_or_404(id)
     
     try:
+        if maintenance_request.is_open():
+            Equipment.adjust_open_requests(maintenance_request.equipment_id, -1)
         db.session.delete(maintenance_request)
         db.session.commit()
         flash('Request deleted successfully!', 'success')
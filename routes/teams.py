@@ -1,12 +1,18 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
+from sqlalchemy.orm import selectinload
 from models import db, MaintenanceTeam, Technician
+from replicas import read_only
+import refdata
+from etags import conditional
 
 bp = Blueprint('teams', __name__, url_prefix='/teams')
 
 @bp.route('/')
+@read_only
+@conditional('maintenance_team', 'technician')
 def list_teams():
     """List all maintenance teams"""
-    teams = MaintenanceTeam.query.all()
+    teams = MaintenanceTeam.query.options(selectinload(MaintenanceTeam.technicians)).all()
     return render_template('teams.html', teams=teams)
 
 @bp.route('/create', methods=['GET', 'POST'])
@@ -20,6 +26,7 @@ def create():
             
             db.session.add(team)
             db.session.commit()
+            refdata.invalidate()
             
             flash('Team created successfully!', 'success')
             return redirect(url_for('teams.list_teams'))
@@ -39,6 +46,7 @@ def edit(id):
         try:
             team.team_name = request.form['team_name']
             db.session.commit()
+            refdata.invalidate()
             
             flash('Team updated successfully!', 'success')
             return redirect(url_for('teams.list_teams'))
@@ -57,6 +65,7 @@ def delete(id):
     try:
         db.session.delete(team)
         db.session.commit()
+        refdata.invalidate()
         flash('Team deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -77,6 +86,7 @@ def create_technician(team_id):
         
         db.session.add(technician)
         db.session.commit()
+        refdata.invalidate()
         
         flash('Technician added successfully!', 'success')
     except Exception as e:
@@ -93,6 +103,7 @@ def delete_technician(id):
     try:
         db.session.delete(technician)
         db.session.commit()
+        refdata.invalidate()
         flash('Technician deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
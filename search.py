@@ -0,0 +1,176 @@
+"""
+GearGuard - Equipment search
+
+Full-text search over equipment name, serial number and location. MySQL
+uses a FULLTEXT index and SQLite an FTS5 table kept in sync by triggers;
+both are installed by migration 0003. Each search term matches as a
+prefix, and every term must match.
+
+Databases without the index (other engines, or before `flask db-upgrade`)
+fall back to prefix LIKE matching so search keeps working.
+"""
+import re
+from sqlalchemy import column, inspect, or_, text
+from models import db, Equipment
+
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 25
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+# engine url -> whether the search index exists
+_index_installed = {}
+
+
+# ---------------- INDEX DDL ----------------
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS equipment_fts USING fts5(
+        equipment_name, serial_number, location,
+        content='equipment', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS equipment_fts_ai AFTER INSERT ON equipment BEGIN
+        INSERT INTO equipment_fts(rowid, equipment_name, serial_number, location)
+        VALUES (new.id, new.equipment_name, new.serial_number, new.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS equipment_fts_ad AFTER DELETE ON equipment BEGIN
+        INSERT INTO equipment_fts(equipment_fts, rowid, equipment_name, serial_number, location)
+        VALUES ('delete', old.id, old.equipment_name, old.serial_number, old.location);
+    END""",
+    # Only the searched columns: counter updates must not touch the index
+    """CREATE TRIGGER IF NOT EXISTS equipment_fts_au
+    AFTER UPDATE OF equipment_name, serial_number, location ON equipment BEGIN
+        INSERT INTO equipment_fts(equipment_fts, rowid, equipment_name, serial_number, location)
+        VALUES ('delete', old.id, old.equipment_name, old.serial_number, old.location);
+        INSERT INTO equipment_fts(rowid, equipment_name, serial_number, location)
+        VALUES (new.id, new.equipment_name, new.serial_number, new.location);
+    END""",
+    "INSERT INTO equipment_fts(equipment_fts) VALUES ('rebuild')",
+]
+
+MYSQL_DDL = [
+    'ALTER TABLE equipment ADD FULLTEXT INDEX ft_equipment_search (equipment_name, serial_number, location)',
+]
+
+
+def install_index(connection):
+    """Create the dialect's search index and backfill it"""
+    if connection.dialect.name == 'sqlite':
+        statements = SQLITE_DDL
+    elif connection.dialect.name == 'mysql':
+        if 'ft_equipment_search' in {i['name'] for i in inspect(connection).get_indexes('equipment')}:
+            return
+        statements = MYSQL_DDL
+    else:
+        return
+
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+    _index_installed.pop(str(connection.engine.url), None)
+
+
+def _has_index():
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _index_installed:
+        with engine.connect() as connection:
+            if engine.dialect.name == 'sqlite':
+                _index_installed[key] = inspect(connection).has_table('equipment_fts')
+            elif engine.dialect.name == 'mysql':
+                indexes = inspect(connection).get_indexes('equipment')
+                _index_installed[key] = 'ft_equipment_search' in {i['name'] for i in indexes}
+            else:
+                _index_installed[key] = False
+    return _index_installed[key]
+
+
+# ---------------- QUERIES ----------------
+def _terms(query):
+    return _TERM.findall(query or '')[:8]
+
+
+def _ranked_matches(terms):
+    """
+    Textual SELECT of (id, score) for equipment matching every term, lower
+    score ranking higher. None when there's no index to use.
+    """
+    if not terms or not _has_index():
+        return None
+
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        # Name and serial matches outrank location matches
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return text(
+            'SELECT rowid AS id, bm25(equipment_fts, 10.0, 10.0, 1.0) AS score '
+            'FROM equipment_fts WHERE equipment_fts MATCH :match'
+        ).bindparams(match=match).columns(column('id'), column('score'))
+
+    match = ' '.join(f'+{term}*' for term in terms)
+    return text(
+        'SELECT id, -MATCH(equipment_name, serial_number, location) '
+        'AGAINST (:match IN BOOLEAN MODE) AS score '
+        'FROM equipment WHERE MATCH(equipment_name, serial_number, location) '
+        'AGAINST (:match IN BOOLEAN MODE)'
+    ).bindparams(match=match).columns(column('id'), column('score'))
+
+
+def _like_filter(terms):
+    return db.and_(*[
+        or_(
+            Equipment.equipment_name.like(f'{term}%'),
+            Equipment.serial_number.like(f'{term}%'),
+            Equipment.location.like(f'{term}%')
+        )
+        for term in terms
+    ])
+
+
+def search_filter(query):
+    """Filter clause restricting Equipment to rows matching a search box query"""
+    terms = _terms(query)
+    if not terms:
+        return db.false()
+
+    matches = _ranked_matches(terms)
+    if matches is None:
+        return _like_filter(terms)
+    return Equipment.id.in_(db.select(matches.subquery().c.id))
+
+
+def typeahead_query(query, limit=TYPEAHEAD_LIMIT, include_scrapped=False):
+    """The Equipment query behind typeahead(), or None for a query with no terms"""
+    terms = _terms(query)
+    if not terms:
+        return None
+
+    limit = min(max(limit, 1), TYPEAHEAD_MAX_LIMIT)
+    matches = _ranked_matches(terms)
+    if matches is None:
+        rows = Equipment.query.filter(_like_filter(terms))
+    else:
+        ranked = matches.subquery()
+        rows = Equipment.query.join(ranked, ranked.c.id == Equipment.id).order_by(ranked.c.score)
+
+    if not include_scrapped:
+        rows = rows.filter(Equipment.is_scrapped == False)  # noqa: E712
+    return rows.order_by(Equipment.equipment_name, Equipment.id).limit(limit)
+
+
+def typeahead(query, limit=TYPEAHEAD_LIMIT, include_scrapped=False):
+    """Best matches for a partial query, as dicts for the request form"""
+    rows = typeahead_query(query, limit, include_scrapped)
+    if rows is None:
+        return []
+
+    return [
+        {
+            'id': e.id,
+            'equipment_name': e.equipment_name,
+            'serial_number': e.serial_number,
+            'location': e.location,
+            'maintenance_team_id': e.maintenance_team_id,
+            'default_technician_id': e.default_technician_id,
+            'is_scrapped': e.is_scrapped,
+        }
+        for e in rows
+    ]
@@ -0,0 +1,135 @@
+"""
+GearGuard - Production server
+
+`flask --app app serve` (or `python -m server`) runs GearGuard under
+gunicorn with gevent workers (Linux/macOS; pip install gunicorn gevent):
+one master process that builds the app once and forks worker processes.
+Each worker serves many requests at once on greenlets, so an open Kanban
+board's event stream costs a greenlet, not a thread or a process.
+
+gevent is patched in before anything else is imported, so every lock,
+queue and socket the app creates cooperates with it. Building the app
+opens no database connections, and each worker throws away any pool it
+inherited and opens its own. Background threads (the overdue sweeper,
+the status log writer, the event reader) start inside each worker on
+first use, never in the master.
+
+Workers are replaced without dropping requests: one that has served
+SERVER_MAX_REQUESTS stops accepting, ends its event streams so their
+boards reconnect to another worker and resume from their last event,
+finishes its other requests and exits while the master forks its
+replacement, all on the same listening socket. With more than one
+worker, set EVENT_BROKER_URL so moves reach boards on every worker.
+
+    kill -HUP $(cat gearguard.pid)    # replace every worker (same code)
+    kill -USR2 $(cat gearguard.pid)   # start a second master with new code
+    kill -TERM <old master pid>       # ...and once it is up, stop the old one
+"""
+if __name__ == '__main__':
+    from gevent import monkey
+    monkey.patch_all()
+
+import logging
+import os
+import threading
+import time
+import click
+from gunicorn.app.base import BaseApplication
+
+log = logging.getLogger('server')
+
+
+def default_workers():
+    return 2 * (os.cpu_count() or 1) + 1
+
+
+def _dispose_pools(app):
+    from models import db
+
+    # close=False: the parent's connections are left alone, not shut from the child
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def _end_streams_when_stopping(worker):
+    from events import get_broker
+
+    # worker.alive turns False on a graceful stop (HUP, TERM, max requests)
+    def watch():
+        while worker.alive:
+            time.sleep(1)
+        get_broker().close_streams()
+
+    threading.Thread(target=watch, name='stream-closer', daemon=True).start()
+
+
+class GearGuardServer(BaseApplication):
+    """gunicorn application serving an already built Flask app"""
+
+    def __init__(self, app, options):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('post_fork', lambda arbiter, worker: _dispose_pools(self.application))
+        # After the worker has patched in gevent, so the watcher is a greenlet
+        self.cfg.set('post_worker_init', _end_streams_when_stopping)
+
+    def load(self):
+        return self.application
+
+
+def serve(app, bind, workers=None, connections=None, max_requests=None, timeout=30, graceful_timeout=30,
+          pidfile=None):
+    """Serve until the master is stopped"""
+    from events import InProcessBroker, get_broker
+
+    config = app.config
+    workers = workers or config['SERVER_WORKERS'] or default_workers()
+    max_requests = config['SERVER_MAX_REQUESTS'] if max_requests is None else max_requests
+    if workers > 1 and isinstance(get_broker(), InProcessBroker):
+        log.warning('%d workers without EVENT_BROKER_URL: a Kanban move only reaches '
+                    'boards connected to the worker that made it', workers)
+    # The master holds no connections, but drop any pool before forking anyway
+    _dispose_pools(app)
+    GearGuardServer(app, {
+        'bind': bind,
+        'workers': workers,
+        'worker_class': 'gevent',
+        'worker_connections': connections or config['SERVER_CONNECTIONS'],
+        'preload_app': True,
+        'max_requests': max_requests,
+        # Spread recycling out so workers are not all replaced at once
+        'max_requests_jitter': max_requests // 10,
+        'timeout': timeout,
+        'graceful_timeout': graceful_timeout,
+        'pidfile': pidfile,
+        'accesslog': '-',
+    }).run()
+
+
+@click.command()
+@click.option('--bind', default='0.0.0.0:5000', show_default=True, help='Address to listen on.')
+@click.option('--workers', type=int, default=None, help='Worker processes (default SERVER_WORKERS).')
+@click.option('--connections', type=int, default=None,
+              help='Requests, event streams included, one worker serves at once (default SERVER_CONNECTIONS).')
+@click.option('--max-requests', type=int, default=None, help='Recycle a worker after this many requests.')
+@click.option('--timeout', type=int, default=30, show_default=True, help='Restart a worker silent this long.')
+@click.option('--graceful-timeout', type=int, default=30, show_default=True,
+              help='Seconds a stopping worker gets to finish its requests.')
+@click.option('--pidfile', default=None, help='Write the master pid here (for HUP/USR2 reloads).')
+def main(bind, workers, connections, max_requests, timeout, graceful_timeout, pidfile):
+    """Serve GearGuard with preforked gevent workers."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    from app import create_app
+
+    serve(create_app(), bind, workers=workers, connections=connections, max_requests=max_requests,
+          timeout=timeout, graceful_timeout=graceful_timeout, pidfile=pidfile)
+
+
+if __name__ == '__main__':
+    main()
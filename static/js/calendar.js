@@ -0,0 +1,167 @@
+// Calendar month navigation without full page reloads
+
+const MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June',
+                     'July', 'August', 'September', 'October', 'November', 'December'];
+
+let calendar = null;
+
+document.addEventListener('DOMContentLoaded', function() {
+    calendar = document.querySelector('.calendar');
+    if (!calendar) {
+        return;
+    }
+
+    document.getElementById('calendar-prev').addEventListener('click', e => {
+        e.preventDefault();
+        showMonth(...shiftMonth(-1), true);
+    });
+    document.getElementById('calendar-next').addEventListener('click', e => {
+        e.preventDefault();
+        showMonth(...shiftMonth(1), true);
+    });
+
+    window.addEventListener('popstate', e => {
+        if (e.state && e.state.year) {
+            showMonth(e.state.year, e.state.month, false);
+        }
+    });
+    history.replaceState({ year: currentYear(), month: currentMonth() }, '');
+});
+
+function currentYear() {
+    return parseInt(calendar.dataset.year, 10);
+}
+
+function currentMonth() {
+    return parseInt(calendar.dataset.month, 10);
+}
+
+function shiftMonth(delta) {
+    const date = new Date(currentYear(), currentMonth() - 1 + delta, 1);
+    return [date.getFullYear(), date.getMonth() + 1];
+}
+
+function pad(value) {
+    return String(value).padStart(2, '0');
+}
+
+function showMonth(year, month, pushHistory) {
+    const lastDay = new Date(year, month, 0).getDate();
+    const start = `${year}-${pad(month)}-01`;
+    const end = `${year}-${pad(month)}-${pad(lastDay)}`;
+
+    // The range endpoint sends ETags, so revisited months revalidate with a 304
+    fetch(`/dashboard/calendar/range?start=${start}&end=${end}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.message);
+            }
+
+            calendar.dataset.year = year;
+            calendar.dataset.month = month;
+            renderMonth(year, month, data.days);
+            updateNavigation(year, month);
+
+            if (pushHistory) {
+                history.pushState({ year, month }, '', `?year=${year}&month=${month}`);
+            }
+        })
+        .catch(error => {
+            console.error('Error loading calendar:', error);
+            // Fall back to a regular page load
+            window.location.search = `?year=${year}&month=${month}`;
+        });
+}
+
+function updateNavigation(year, month) {
+    document.getElementById('calendar-title').textContent = `${MONTH_NAMES[month - 1]} ${year}`;
+
+    const [prevYear, prevMonth] = shiftMonth(-1);
+    const [nextYear, nextMonth] = shiftMonth(1);
+    document.getElementById('calendar-prev').href = `?year=${prevYear}&month=${prevMonth}`;
+    document.getElementById('calendar-next').href = `?year=${nextYear}&month=${nextMonth}`;
+
+    const monthSelect = document.querySelector('.calendar-jump select[name="month"]');
+    const yearSelect = document.querySelector('.calendar-jump select[name="year"]');
+    if (monthSelect) {
+        monthSelect.value = month;
+    }
+    if (yearSelect && yearSelect.querySelector(`option[value="${year}"]`)) {
+        yearSelect.value = year;
+    }
+}
+
+function renderMonth(year, month, days) {
+    const body = calendar.querySelector('.calendar-body');
+    const lastDay = new Date(year, month, 0).getDate();
+    // Weeks start on Sunday, matching the server-rendered grid
+    const cells = new Array(new Date(year, month - 1, 1).getDay()).fill(null);
+    for (let day = 1; day <= lastDay; day++) {
+        cells.push(day);
+    }
+    while (cells.length % 7) {
+        cells.push(null);
+    }
+
+    body.innerHTML = '';
+    for (let i = 0; i < cells.length; i += 7) {
+        const row = document.createElement('div');
+        row.className = 'calendar-row';
+        cells.slice(i, i + 7).forEach(day => row.appendChild(renderCell(year, month, day, days)));
+        body.appendChild(row);
+    }
+}
+
+function renderCell(year, month, day, days) {
+    const cell = document.createElement('div');
+    if (!day) {
+        cell.className = 'calendar-cell empty';
+        return cell;
+    }
+
+    const isoDate = `${year}-${pad(month)}-${pad(day)}`;
+    cell.className = 'calendar-cell has-day';
+    cell.dataset.date = isoDate;
+
+    const header = document.createElement('div');
+    header.className = 'calendar-date';
+    const number = document.createElement('span');
+    number.className = 'day-number';
+    number.textContent = day;
+    const add = document.createElement('a');
+    add.className = 'add-request-btn';
+    add.title = 'Add request';
+    add.href = `/requests/create?date=${isoDate}`;
+    add.textContent = '+';
+    header.append(number, add);
+    cell.appendChild(header);
+
+    const requests = days[isoDate];
+    if (requests) {
+        const list = document.createElement('div');
+        list.className = 'calendar-requests';
+        requests.forEach(req => {
+            // Archived requests can't be edited, so they get no link
+            const item = document.createElement(req.archived ? 'div' : 'a');
+            item.className = 'calendar-request-item';
+            if (req.archived) {
+                item.classList.add('archived');
+                item.title = 'Archived';
+            } else {
+                item.href = `/requests/edit/${req.id}`;
+            }
+            [['request-time', req.equipment], ['request-title', req.subject],
+             ['request-tech', req.technician || 'Unassigned']].forEach(([className, text]) => {
+                const line = document.createElement('div');
+                line.className = className;
+                line.textContent = text;
+                item.appendChild(line);
+            });
+            list.appendChild(item);
+        });
+        cell.appendChild(list);
+    }
+
+    return cell;
+}
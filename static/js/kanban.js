@@ -1,6 +1,13 @@
 // Kanban Drag and Drop Functionality
 
-let draggedCard = null;
+// Delay before queued moves are sent, so a burst of drops is one request
+const MOVE_BATCH_DELAY = 300;
+
+let draggedCards = [];
+let pendingMoves = new Map();
+let flushTimer = null;
+// Cards whose moves are on their way to the server; the response is authoritative
+let inflightIds = new Set();
 
 // Initialize drag and drop
 document.addEventListener('DOMContentLoaded', function() {
@@ -8,10 +15,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const columns = document.querySelectorAll('.kanban-cards');
     
     // Add drag event listeners to cards
-    cards.forEach(card => {
-        card.addEventListener('dragstart', handleDragStart);
-        card.addEventListener('dragend', handleDragEnd);
-    });
+    cards.forEach(initCard);
     
     // Add drop event listeners to columns
     columns.forEach(column => {
@@ -20,17 +24,87 @@ document.addEventListener('DOMContentLoaded', function() {
         column.addEventListener('dragenter', handleDragEnter);
         column.addEventListener('dragleave', handleDragLeave);
     });
+
+    // Columns are capped server-side; fetch further cards on demand
+    document.querySelectorAll('.load-more').forEach(button => {
+        button.addEventListener('click', handleLoadMore);
+    });
+
+    connectFeed();
 });
 
+function initCard(card) {
+    card.addEventListener('dragstart', handleDragStart);
+    card.addEventListener('dragend', handleDragEnd);
+    card.addEventListener('click', handleCardClick);
+}
+
+function handleLoadMore(e) {
+    const button = this;
+    const cardsContainer = button.closest('.kanban-column').querySelector('.kanban-cards');
+    button.disabled = true;
+
+    fetch(button.dataset.url)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                showNotification('Error loading cards: ' + data.message, 'error');
+                button.disabled = false;
+                return;
+            }
+
+            const template = document.createElement('template');
+            template.innerHTML = data.html;
+            template.content.querySelectorAll('.kanban-card').forEach(card => {
+                // Skip cards that were dragged in before this page arrived
+                if (!cardsContainer.querySelector(`[data-request-id="${card.dataset.requestId}"]`)) {
+                    initCard(card);
+                    cardsContainer.appendChild(card);
+                }
+            });
+
+            if (data.has_more) {
+                button.dataset.url = data.next_url;
+                button.disabled = false;
+            } else {
+                button.remove();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showNotification('Network error occurred', 'error');
+            button.disabled = false;
+        });
+}
+
 function handleDragStart(e) {
-    draggedCard = this;
-    this.classList.add('dragging');
+    // Dragging a selected card carries the whole selection with it
+    if (!this.classList.contains('selected')) {
+        clearSelection();
+    }
+    draggedCards = this.classList.contains('selected')
+        ? Array.from(document.querySelectorAll('.kanban-card.selected'))
+        : [this];
+
+    draggedCards.forEach(card => card.classList.add('dragging'));
     e.dataTransfer.effectAllowed = 'move';
-    e.dataTransfer.setData('text/html', this.innerHTML);
+    e.dataTransfer.setData('text/plain', this.dataset.requestId);
 }
 
 function handleDragEnd(e) {
-    this.classList.remove('dragging');
+    draggedCards.forEach(card => card.classList.remove('dragging'));
+}
+
+function handleCardClick(e) {
+    // Ctrl/Cmd-click builds a selection for moving many cards at once
+    if (e.ctrlKey || e.metaKey) {
+        e.preventDefault();
+        this.classList.toggle('selected');
+    }
+}
+
+function clearSelection() {
+    document.querySelectorAll('.kanban-card.selected').forEach(card => card.classList.remove('selected'));
 }
 
 function handleDragOver(e) {
@@ -50,74 +124,234 @@ function handleDragLeave(e) {
 }
 
 function handleDrop(e) {
-    if (e.stopPropagation) {
-        e.stopPropagation();
-    }
-    
+    e.preventDefault();
+    e.stopPropagation();
     this.classList.remove('drag-over');
-    
-    if (draggedCard !== this) {
-        // Get the new status from the column
-        const newStatus = this.closest('.kanban-column').dataset.status;
-        const requestId = draggedCard.dataset.requestId;
-        
-        // Update status via API
-        updateRequestStatus(requestId, newStatus);
-        
-        // Move the card visually
-        this.appendChild(draggedCard);
-        
-        // Update badge count
-        updateColumnBadges();
-    }
-    
-    return false;
+
+    const targetColumn = this.closest('.kanban-column');
+    const newStatus = targetColumn.dataset.status;
+
+    draggedCards.forEach(card => {
+        const sourceColumn = card.closest('.kanban-column');
+        if (sourceColumn === targetColumn) {
+            return;
+        }
+
+        moveCard(card, sourceColumn, targetColumn);
+        card.classList.add('drop-animate');
+        setTimeout(() => card.classList.remove('drop-animate'), 300);
+
+        queueMove(card, newStatus, sourceColumn.dataset.status);
+    });
+
+    clearSelection();
+    draggedCards = [];
 }
 
-function updateRequestStatus(requestId, newStatus) {
-    fetch('/requests/update_status', {
+function moveCard(card, fromColumn, toColumn) {
+    toColumn.querySelector('.kanban-cards').appendChild(card);
+    adjustBadge(fromColumn, -1);
+    adjustBadge(toColumn, 1);
+}
+
+function columnFor(status) {
+    return document.querySelector(`.kanban-column[data-status="${status}"]`);
+}
+
+// ---------------- BATCHED MOVES ----------------
+// Moves made in quick succession go to the server as one transaction
+
+function queueMove(card, status, previousStatus) {
+    const id = card.dataset.requestId;
+    const queued = pendingMoves.get(id);
+    pendingMoves.set(id, {
+        card,
+        status,
+        // A card dragged twice before the flush reverts to where it started
+        previousStatus: queued ? queued.previousStatus : previousStatus
+    });
+
+    clearTimeout(flushTimer);
+    flushTimer = setTimeout(flushMoves, MOVE_BATCH_DELAY);
+}
+
+function flushMoves() {
+    const batch = Array.from(pendingMoves.values())
+        .filter(move => move.status !== move.previousStatus);
+    pendingMoves.clear();
+    if (!batch.length) {
+        return;
+    }
+
+    batch.forEach(move => inflightIds.add(move.card.dataset.requestId));
+
+    fetch('/requests/transitions', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-            request_id: requestId,
-            status: newStatus
+            moves: batch.map(move => ({
+                id: parseInt(move.card.dataset.requestId, 10),
+                status: move.status,
+                version: parseInt(move.card.dataset.version, 10)
+            }))
         })
     })
     .then(response => response.json())
     .then(data => {
-        if (data.success) {
-            console.log('Status updated successfully');
-            
-            // Show a success message
-            showNotification('Request moved to ' + newStatus, 'success');
-            
-            // If moved to Scrap, show additional notification
-            if (newStatus === 'Scrap') {
-                showNotification('Equipment has been marked as scrapped', 'warning');
-            }
-        } else {
+        if (!data.success) {
             console.error('Error updating status:', data.message);
             showNotification('Error updating status: ' + data.message, 'error');
             // Reload page to restore correct state
             setTimeout(() => location.reload(), 2000);
+            return;
         }
+        applyResults(batch, data);
     })
     .catch(error => {
         console.error('Error:', error);
         showNotification('Network error occurred', 'error');
         setTimeout(() => location.reload(), 2000);
+    })
+    .finally(() => {
+        batch.forEach(move => inflightIds.delete(move.card.dataset.requestId));
     });
 }
 
-function updateColumnBadges() {
-    const columns = document.querySelectorAll('.kanban-column');
-    columns.forEach(column => {
-        const badge = column.querySelector('.badge');
-        const cardsCount = column.querySelectorAll('.kanban-card').length;
-        badge.textContent = cardsCount;
+function applyResults(batch, data) {
+    const cards = new Map(batch.map(move => [String(move.card.dataset.requestId), move.card]));
+
+    data.applied.forEach(result => {
+        cards.get(String(result.id)).dataset.version = result.version;
     });
+
+    data.conflicts.forEach(conflict => {
+        const card = cards.get(String(conflict.id));
+        const column = card.closest('.kanban-column');
+        if (conflict.reason === 'not_found') {
+            adjustBadge(column, -1);
+            card.remove();
+            return;
+        }
+        // Someone else moved or edited the card; show it where it really is
+        card.dataset.version = conflict.version;
+        const actualColumn = columnFor(conflict.status);
+        if (actualColumn && actualColumn !== column) {
+            moveCard(card, column, actualColumn);
+        }
+    });
+
+    if (data.applied.length) {
+        const target = data.applied.length === 1 ? data.applied[0].status : 'their new columns';
+        showNotification(`${data.applied.length} request(s) moved to ${target}`, 'success');
+    }
+    if (data.applied.some(result => result.status === 'Scrap')) {
+        showNotification('Equipment has been marked as scrapped', 'warning');
+    }
+    if (data.conflicts.length) {
+        showNotification(`${data.conflicts.length} card(s) were changed by someone else and not moved`, 'warning');
+    }
+}
+
+// ---------------- LIVE UPDATES ----------------
+// Other users' changes arrive over Server-Sent Events and patch single cards
+
+function connectFeed() {
+    if (!window.EventSource) {
+        return;
+    }
+    // EventSource reconnects by itself and resumes from the last event id
+    const source = new EventSource('/dashboard/kanban/events');
+    source.addEventListener('card', e => handleCardEvent(JSON.parse(e.data)));
+    source.addEventListener('equipment', e => handleEquipmentEvent(JSON.parse(e.data)));
+    source.addEventListener('reload', () => location.reload());
+}
+
+function findCard(id) {
+    return document.querySelector(`.kanban-card[data-request-id="${id}"]`);
+}
+
+function handleCardEvent(event) {
+    const id = String(event.id);
+    if (pendingMoves.has(id) || inflightIds.has(id)) {
+        return;
+    }
+
+    const card = findCard(id);
+    if (event.op === 'delete') {
+        const column = card ? card.closest('.kanban-column') : columnFor(event.status);
+        if (column) {
+            adjustBadge(column, -1);
+        }
+        if (card) {
+            card.remove();
+        }
+        return;
+    }
+
+    // Already showing this version, e.g. our own move
+    if (card && parseInt(card.dataset.version, 10) >= event.version) {
+        return;
+    }
+
+    if (!card) {
+        // Not loaded here: a new card, or one moved out of an unloaded part of a column
+        const previousColumn = event.previous ? columnFor(event.previous) : null;
+        if (previousColumn && event.previous !== event.status) {
+            adjustBadge(previousColumn, -1);
+        }
+        if (!event.previous || event.previous !== event.status) {
+            adjustBadge(columnFor(event.status), 1);
+        }
+    }
+    refreshCard(id);
+}
+
+function handleEquipmentEvent(event) {
+    document.querySelectorAll(`.kanban-card[data-equipment-id="${event.id}"]`)
+        .forEach(card => refreshCard(card.dataset.requestId));
+}
+
+function refreshCard(id) {
+    fetch(`/dashboard/kanban/card/${id}`)
+        .then(response => response.json())
+        .then(data => {
+            const card = findCard(id);
+            if (!data.success) {
+                // Deleted meanwhile; its delete event fixes the badge
+                return;
+            }
+            if (card && parseInt(card.dataset.version, 10) > data.version) {
+                return;
+            }
+
+            const template = document.createElement('template');
+            template.innerHTML = data.html.trim();
+            const fresh = template.content.firstElementChild;
+            initCard(fresh);
+
+            const targetColumn = columnFor(data.status);
+            if (card && card.closest('.kanban-column') === targetColumn) {
+                card.replaceWith(fresh);
+                return;
+            }
+            if (card) {
+                adjustBadge(card.closest('.kanban-column'), -1);
+                adjustBadge(targetColumn, 1);
+                card.remove();
+            }
+            targetColumn.querySelector('.kanban-cards').prepend(fresh);
+        })
+        .catch(error => console.error('Error refreshing card:', error));
+}
+
+function adjustBadge(column, delta) {
+    // Columns only hold the loaded cards, so badges track the server total
+    const badge = column.querySelector('.badge');
+    const total = parseInt(badge.dataset.total, 10) + delta;
+    badge.dataset.total = total;
+    badge.textContent = total;
 }
 
 function showNotification(message, type) {
@@ -170,22 +404,9 @@ style.textContent = `
         background: #e3f2fd;
         border: 2px dashed #2196f3;
     }
+
+    .kanban-card.selected {
+        outline: 2px solid #2196f3;
+    }
 `;
 document.head.appendChild(style);
-
-
-function handleDrop(e) {
-  e.preventDefault();
-  this.classList.remove('drag-over');
-
-  if (draggedCard) {
-    draggedCard.classList.add('drop-animate');
-    this.appendChild(draggedCard);
-
-    setTimeout(() => {
-      draggedCard.classList.remove('drop-animate');
-    }, 300);
-
-    updateColumnBadges();
-  }
-}
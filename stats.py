@@ -0,0 +1,96 @@
+"""
+GearGuard - Dashboard statistics
+"""
+from sqlalchemy import case, func, select, true
+from sqlalchemy.orm import joinedload
+from models import db, Equipment, MaintenanceRequest, MaintenanceRequestArchive, MaintenanceTeam
+from overdue import today
+from cache import TTLCache
+from changes import on_commit
+from replicas import use_primary
+
+# Rows shown in the dashboard's overdue table; the card shows the full total
+OVERDUE_LIST_LIMIT = 10
+
+# Writes in this process clear the cache straight away; the TTL bounds how
+# long other worker processes can show numbers that predate a write
+_stats_cache = TTLCache(maxsize=4, ttl=60)
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+@use_primary
+def _compute_stats():
+    request_counts = select(
+        func.count(MaintenanceRequest.id).label('total_requests'),
+        _count_if(MaintenanceRequest.status == 'New').label('new_requests'),
+        _count_if(MaintenanceRequest.status == 'In Progress').label('in_progress_requests'),
+        _count_if(MaintenanceRequest.status == 'Repaired').label('repaired_requests'),
+        _count_if(MaintenanceRequest.overdue == True).label('overdue_requests'),  # noqa: E712
+    ).subquery()
+    # Archived requests are all closed; they only add to the history totals
+    archived_counts = select(
+        func.count(MaintenanceRequestArchive.id).label('archived_requests'),
+        _count_if(MaintenanceRequestArchive.status == 'Repaired').label('archived_repaired'),
+    ).subquery()
+    equipment_counts = select(
+        func.count(Equipment.id).label('total_equipment'),
+        _count_if(Equipment.is_scrapped == True).label('scrapped_equipment'),  # noqa: E712
+    ).subquery()
+
+    # Every side is a single-row aggregate, so the cross join is one row
+    row = db.session.execute(
+        select(request_counts, archived_counts, equipment_counts)
+        .select_from(request_counts.join(archived_counts, true()).join(equipment_counts, true()))
+    ).one()
+    stats = dict(row._mapping)
+    stats['total_requests'] += stats.pop('archived_requests')
+    stats['repaired_requests'] += stats.pop('archived_repaired')
+    stats['active_equipment'] = stats['total_equipment'] - stats['scrapped_equipment']
+    stats['overdue_by_team'] = overdue_by_team()
+    return stats
+
+
+def overdue_by_team():
+    """(team_name, overdue count) for teams with overdue work, busiest first"""
+    count = func.count(MaintenanceRequest.id)
+    return db.session.execute(
+        select(MaintenanceTeam.team_name, count)
+        .join(MaintenanceTeam, MaintenanceTeam.id == MaintenanceRequest.maintenance_team_id)
+        .where(MaintenanceRequest.overdue == True)  # noqa: E712
+        .group_by(MaintenanceTeam.id, MaintenanceTeam.team_name)
+        .order_by(count.desc(), MaintenanceTeam.team_name)
+    ).all()
+
+
+def dashboard_stats():
+    """All dashboard counters from one aggregate query plus overdue per team, cached per day"""
+    # Keyed by day, the same UTC day the overdue flags follow
+    return _stats_cache.get_or_set(today(), _compute_stats)
+
+
+def overdue_query():
+    """Overdue requests, oldest first, with the names the dashboard shows"""
+    return MaintenanceRequest.query.options(
+        joinedload(MaintenanceRequest.equipment),
+        joinedload(MaintenanceRequest.assigned_technician)
+    ).filter(
+        MaintenanceRequest.overdue == True  # noqa: E712
+    ).order_by(
+        MaintenanceRequest.scheduled_date, MaintenanceRequest.id
+    )
+
+
+def overdue_requests(limit=OVERDUE_LIST_LIMIT):
+    return overdue_query().limit(limit).all()
+
+
+@on_commit('maintenance_request', 'equipment')
+def invalidate_stats(changed_tables=None):
+    _stats_cache.invalidate()
+
+
+def cache_stats():
+    return _stats_cache.stats()
@@ -0,0 +1,343 @@
+"""
+GearGuard - Status history
+
+Every status change of a maintenance request is appended to
+status_transition: the request, its old and new status, its new row
+version, when and by whom. Time-in-state and repair-time figures are
+computed from it.
+
+Recording stays off the request path. Transitions are collected as the
+session flushes and handed to an in-process queue once the transaction
+commits; a flusher thread per process writes the queue in batches of
+STATUS_LOG_BATCH_SIZE at least every STATUS_LOG_FLUSH_SECONDS. A batch
+the database refuses, and whatever is still queued when the process
+exits, is written to a spool file under STATUS_LOG_SPOOL_DIR and loaded
+by a later flush or by `flask flush-status-log`. (request_id, version_id)
+is unique: rows that repeat a stored transition exactly (a batch loaded
+twice) are skipped, and any other clash is logged and set aside in a
+.rejected file in the spool directory rather than dropped. A process
+killed outright loses at most its last flush interval.
+
+Deleting a request deletes its history in the same transaction.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from flask import current_app, has_request_context, session as user_session
+from sqlalchemy import delete, event, func, insert, inspect, select, tuple_
+from sqlalchemy.orm import Session
+from models import db, MaintenanceRequest, MaintenanceRequestArchive, StatusTransition
+
+log = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SECONDS = 1.0
+DEFAULT_BATCH_SIZE = 500
+
+# MySQL DATETIME drops the microseconds a replayed row still carries
+_REPLAY_TOLERANCE = timedelta(seconds=1)
+
+
+# ---------------- COLLECTING ----------------
+def _current_user():
+    return user_session.get('user_id') if has_request_context() else None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect(session, flush_context):
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, MaintenanceRequest)]
+    if deleted:
+        session.connection().execute(
+            delete(StatusTransition.__table__).where(StatusTransition.request_id.in_(deleted))
+        )
+        session.info.setdefault('status_purged', set()).update(deleted)
+
+    for obj in session.dirty:
+        if not isinstance(obj, MaintenanceRequest):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.added:
+            continue
+        previous = history.deleted[0] if history.deleted else None
+        if previous == history.added[0]:
+            continue
+        session.info.setdefault('status_transitions', []).append({
+            'request_id': obj.id,
+            'version_id': obj.version_id,
+            'from_status': previous,
+            'to_status': history.added[0],
+            'changed_at': datetime.utcnow(),
+            'changed_by': _current_user(),
+        })
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue(session):
+    transitions = session.info.pop('status_transitions', None)
+    purged = session.info.pop('status_purged', None)
+    if transitions:
+        writer().enqueue(transitions)
+    if purged:
+        # Moves still queued for a request deleted since
+        writer().forget(purged)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard(session, previous_transaction):
+    session.info.pop('status_transitions', None)
+    session.info.pop('status_purged', None)
+
+
+# ---------------- WRITING ----------------
+def _is_replay(stored, row):
+    return (
+        (stored.from_status, stored.to_status, stored.changed_by)
+        == (row['from_status'], row['to_status'], row['changed_by'])
+        and abs(stored.changed_at - row['changed_at']) < _REPLAY_TOLERANCE
+    )
+
+
+def _write(rows, spool_dir):
+    """
+    Insert transitions in one transaction on the primary, skipping exact
+    replays of stored ones; clashes with other stored rows are set aside
+    """
+    table = StatusTransition.__table__
+    with db.engine.begin() as connection:
+        key = tuple_(table.c.request_id, table.c.version_id)
+        stored = {
+            (row.request_id, row.version_id): row
+            for row in connection.execute(
+                select(table).where(key.in_([(row['request_id'], row['version_id']) for row in rows]))
+            )
+        }
+        fresh, clashes = [], []
+        for row in rows:
+            existing = stored.get((row['request_id'], row['version_id']))
+            if existing is None:
+                fresh.append(row)
+            elif not _is_replay(existing, row):
+                clashes.append(row)
+        if fresh:
+            connection.execute(insert(table), fresh)
+    if clashes:
+        log.error('Status log: %d transitions clash with stored history; kept in %s',
+                  len(clashes), _spool(spool_dir, clashes, suffix='rejected'))
+
+
+def _spool(spool_dir, rows, suffix='jsonl'):
+    """Write rows to a new file in spool_dir; returns its path"""
+    os.makedirs(spool_dir, exist_ok=True)
+    name = f'{datetime.utcnow():%Y%m%d%H%M%S}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    partial = os.path.join(spool_dir, f'.{name}.tmp')
+    with open(partial, 'w') as f:
+        for row in rows:
+            f.write(json.dumps({**row, 'changed_at': row['changed_at'].isoformat()}) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    # Appears complete or not at all
+    path = os.path.join(spool_dir, f'{name}.{suffix}')
+    os.replace(partial, path)
+    return path
+
+
+def _read_spool(path):
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    for row in rows:
+        row['changed_at'] = datetime.fromisoformat(row['changed_at'])
+    return rows
+
+
+def load_spool(spool_dir, claimed_too=False):
+    """
+    Write spooled batches to the database, deleting each once it is in;
+    returns the transitions loaded. Batches another process is loading
+    are skipped unless claimed_too, e.g. after that process died.
+    """
+    try:
+        names = sorted(os.listdir(spool_dir))
+    except FileNotFoundError:
+        return 0
+    loaded = 0
+    for name in names:
+        path = os.path.join(spool_dir, name)
+        if name.endswith('.jsonl'):
+            claimed = f'{path}.{os.getpid()}.loading'
+            try:
+                # Whoever renames it first loads it
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+        elif claimed_too and name.endswith('.loading'):
+            claimed = path
+        else:
+            continue
+        rows = _read_spool(claimed)
+        try:
+            if rows:
+                _write(rows, spool_dir)
+        except Exception:
+            if claimed != path:
+                os.rename(claimed, path)
+            raise
+        os.remove(claimed)
+        loaded += len(rows)
+    return loaded
+
+
+class StatusLogWriter:
+    """This process's queue of committed transitions and the thread that writes it"""
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        self.interval = app.config.get('STATUS_LOG_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+        self.batch_size = app.config.get('STATUS_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.spool_dir = app.config['STATUS_LOG_SPOOL_DIR']
+        self._pending = deque()
+        self._lock = threading.Lock()
+        # Serialises flushes between the thread and close()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='status-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, rows):
+        with self._lock:
+            self._pending.extend(rows)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        return len(self._pending)
+
+    def forget(self, request_ids):
+        """Drop queued transitions of these requests"""
+        with self._lock:
+            self._pending = deque(row for row in self._pending if row['request_id'] not in request_ids)
+
+    def _take(self, limit=None):
+        with self._lock:
+            count = len(self._pending) if limit is None else min(limit, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                log.exception('Status log flush failed')
+
+    def flush(self):
+        """Write what is queued, then anything spooled; returns the transitions written"""
+        with self._flush_lock:
+            written = 0
+            with self.app.app_context():
+                while True:
+                    batch = self._take(self.batch_size)
+                    if not batch:
+                        break
+                    try:
+                        _write(batch, self.spool_dir)
+                    except Exception:
+                        # Keep memory bounded while the database is away
+                        _spool(self.spool_dir, batch + self._take())
+                        raise
+                    written += len(batch)
+                written += load_spool(self.spool_dir)
+            return written
+
+    def close(self):
+        """Stop the thread and write or spool everything still queued (runs at exit)"""
+        if self._closed or os.getpid() != self.pid:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.interval + 5)
+        with self._flush_lock:
+            rows = self._take()
+            if not rows:
+                return
+            try:
+                with self.app.app_context():
+                    _write(rows, self.spool_dir)
+            except Exception:
+                log.exception('Status log: spooling %d transitions', len(rows))
+                _spool(self.spool_dir, rows)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def writer():
+    """This process's writer, started on first use so it is never inherited across fork"""
+    global _writer
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                _writer = StatusLogWriter(current_app._get_current_object())
+    return _writer
+
+
+def flush():
+    """Write everything this process has queued (e.g. before reading the history)"""
+    return writer().flush() if _writer is not None and _writer.pid == os.getpid() else 0
+
+
+def init_app(app):
+    if not app.config.get('STATUS_LOG_SPOOL_DIR'):
+        app.config['STATUS_LOG_SPOOL_DIR'] = os.path.join(app.instance_path, 'status-log')
+
+
+# ---------------- READING ----------------
+def history(request_id):
+    """A request's transitions, oldest first"""
+    return db.session.scalars(
+        select(StatusTransition)
+        .where(StatusTransition.request_id == request_id)
+        .order_by(StatusTransition.version_id)
+    ).all()
+
+
+def time_in_state(since):
+    """
+    Mean and total hours spent in each status, over stays that ended on or
+    after `since`: {status: {'stays', 'mean_hours', 'total_hours'}}. A
+    request's first stay starts when the request was created.
+    """
+    live, archived = MaintenanceRequest.__table__, MaintenanceRequestArchive.__table__
+    entered = func.lag(StatusTransition.changed_at).over(
+        partition_by=StatusTransition.request_id, order_by=StatusTransition.version_id
+    )
+    stays = select(
+        StatusTransition.from_status.label('status'),
+        func.coalesce(entered, live.c.created_at, archived.c.created_at).label('entered'),
+        StatusTransition.changed_at.label('left'),
+    ).select_from(
+        StatusTransition.__table__
+        .outerjoin(live, live.c.id == StatusTransition.request_id)
+        .outerjoin(archived, archived.c.id == StatusTransition.request_id)
+    ).subquery()
+
+    totals = defaultdict(lambda: [0, 0.0])
+    rows = db.session.execute(
+        select(stays).where(stays.c.left >= since, stays.c.status.isnot(None), stays.c.entered.isnot(None))
+    )
+    for status, entered_at, left_at in rows:
+        totals[status][0] += 1
+        totals[status][1] += (left_at - entered_at).total_seconds() / 3600
+    return {
+        status: {'stays': count, 'mean_hours': round(hours / count, 2), 'total_hours': round(hours, 2)}
+        for status, (count, hours) in sorted(totals.items())
+    }